@@ -0,0 +1,190 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import hashlib
+import io
+import os
+import threading
+import time
+import pygame
+import utils
+import netutils
+import wconstants
+
+# On-disk cache for remote pictures (news pics), shared by all worker threads
+# Contents are stored by hash (same picture under different URLs is saved only once), together with scaled
+# variants as raw pixels, so a repeated picture costs no bandwidth and no JPEG decoding.
+# Validators (ETag, Last-Modified) are kept per URL, to revalidate stale entries with a conditional request.
+# When the cache is larger than wconstants.imageCacheSize, least recently used URLs are evicted.
+# Index is saved when entries change. Just using them (to know which ones are least recently used) is saved later,
+# every imageIndexSave seconds at most, not to write it on the SD card on every news cycle.
+
+_lock = threading.Lock()
+_index = None
+folder = utils.resource_path(wconstants.IMAGE_CACHE_FOLDER)
+index_file = os.path.join(folder, "index.json")
+_saver = utils.JsonSaver(index_file, wconstants.imageIndexSave)
+
+
+def _load_index():
+    global _index
+    if _index is None:
+        _index = utils.read_json_file(index_file) or {"urls": {}, "blobs": {}}
+    return _index
+
+
+def _save_index(force=False):
+    # Call it holding _lock
+    _saver.change()
+    _saver.save(lambda: _index, force)
+
+
+def _blob_file(digest):
+    return os.path.join(folder, digest + ".img")
+
+
+def _variant_file(digest, size):
+    return os.path.join(folder, "%s_%ix%i.raw" % (digest, size[0], size[1]))
+
+
+def _remove(name):
+    try:
+        os.remove(name)
+    except:
+        pass
+
+
+def _scaled_size(size, width):
+    ix, iy = size
+    if width is None or ix == width:
+        return ix, iy
+    return width, int(iy * (width / ix))
+
+
+def _fetch(url, entry, headers, timeout):
+    # Returns picture bytes, or None if the cached copy is still valid (HTTP 304)
+    reqHeaders = dict(headers or {})
+    if entry and os.path.isfile(_blob_file(entry["hash"])):
+        if entry.get("etag"):
+            reqHeaders["If-None-Match"] = entry["etag"]
+        if entry.get("modified"):
+            reqHeaders["If-Modified-Since"] = entry["modified"]
+    with netutils.urlopen(url, wconstants.HTTP_PICS, timeout=timeout, headers=reqHeaders) as response:
+        body = response.read()
+        if response.status == 304:
+            return None, None, None
+        return body, response.getheader("ETag"), response.getheader("Last-Modified")
+
+
+def _store(url, body, etag, modified):
+    digest = hashlib.sha1(body).hexdigest()
+    index = _load_index()
+    with _lock:
+        if digest not in index["blobs"]:
+            os.makedirs(folder, exist_ok=True)
+            with open(_blob_file(digest) + ".tmp", "wb") as file:
+                file.write(body)
+            os.replace(_blob_file(digest) + ".tmp", _blob_file(digest))
+            index["blobs"][digest] = {"size": len(body), "variants": {}}
+        index["urls"][url] = {"hash": digest, "etag": etag, "modified": modified, "checked": time.time(),
+                              "used": time.time()}
+    return digest
+
+
+def _variant(digest, body, width):
+    # Scaled picture from its raw pixels if already saved. Otherwise decode, scale and save it for the next time
+    # Returns the picture, and if a new variant was saved
+    with _lock:
+        blob = _index["blobs"].get(digest)
+        variants = list(blob["variants"].items()) if blob is not None else []
+    if blob is not None:
+        for key, info in variants:
+            if info["width"] == width:
+                size = tuple(info["size"])
+                try:
+                    with open(_variant_file(digest, size), "rb") as file:
+                        return pygame.image.fromstring(file.read(), size, info["format"]), False
+                except:
+                    with _lock:
+                        blob["variants"].pop(key, None)
+                break
+
+    if body is None:
+        with open(_blob_file(digest), "rb") as file:
+            body = file.read()
+    image = pygame.image.load(io.BytesIO(body))
+    size = _scaled_size(image.get_size(), width)
+    if size != image.get_size():
+        image = pygame.transform.smoothscale(image, size)
+
+    fmt = "RGBA" if image.get_flags() & pygame.SRCALPHA else "RGB"
+    raw = pygame.image.tostring(image, fmt)
+    try:
+        with open(_variant_file(digest, size), "wb") as file:
+            file.write(raw)
+        with _lock:
+            if blob is not None:
+                blob["variants"][str(width)] = {"width": width, "size": size, "format": fmt, "bytes": len(raw)}
+    except:
+        print("Error saving scaled picture")
+
+    return image, True
+
+
+def _evict():
+    # Least recently used URLs first. Pictures (and their variants) are deleted when no URL refers to them
+    index = _load_index()
+    with _lock:
+        total = sum(b["size"] + sum(v["bytes"] for v in b["variants"].values()) for b in index["blobs"].values())
+        if total <= wconstants.imageCacheSize:
+            return
+        for url in sorted(index["urls"], key=lambda u: index["urls"][u]["used"]):
+            digest = index["urls"].pop(url)["hash"]
+            if digest in index["blobs"] and all(e["hash"] != digest for e in index["urls"].values()):
+                blob = index["blobs"].pop(digest)
+                _remove(_blob_file(digest))
+                for info in blob["variants"].values():
+                    _remove(_variant_file(digest, info["size"]))
+                total -= blob["size"] + sum(v["bytes"] for v in blob["variants"].values())
+            if total <= wconstants.imageCacheSize:
+                break
+
+
+def get_image(url, headers=None, timeout=None, width=None):
+    # Cached picture (scaled to width, if given). Fresh entries are used without even asking the server
+    index = _load_index()
+    with _lock:
+        entry = index["urls"].get(url)
+        entry = dict(entry) if entry else None
+
+    body = None
+    digest = entry["hash"] if entry else None
+    if entry is None or time.time() - entry["checked"] > wconstants.imageCacheFresh or \
+            not os.path.isfile(_blob_file(digest)):
+        try:
+            body, etag, modified = _fetch(url, entry, headers, timeout)
+        except:
+            if entry is None or not os.path.isfile(_blob_file(digest)):
+                raise
+            # Server not available: keep using the cached copy
+            print("Error revalidating cached picture", url)
+        if body is not None:
+            digest = _store(url, body, etag, modified)
+        elif entry is not None:
+            with _lock:
+                index["urls"][url]["checked"] = time.time()
+        changed = True
+    else:
+        changed = False
+
+    image, added = _variant(digest, body, width)
+    with _lock:
+        if url in index["urls"]:
+            index["urls"][url]["used"] = time.time()
+    if body is not None or added:
+        # Cache only grows when something is added
+        _evict()
+    with _lock:
+        _save_index(force=changed or added)
+
+    return image
@@ -0,0 +1,638 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import hashlib
+import http.client
+import io
+import json
+import os
+import queue
+import random
+import socket
+import threading
+import time
+import urllib.error
+import urllib.parse
+import zlib
+import collections
+import wconstants
+
+# Shared HTTP client for all outbound calls (weather, news, pics, geolocation)
+# Connections are kept alive and pooled per host, responses are requested gzipped and DNS results are cached.
+# "No cache" is granted by the headers plus a cache-busting query parameter (for selected endpoints)
+
+MAX_REDIRECTS = 5
+MAX_IDLE = 2                        # Idle connections kept per host
+IDLE_TIMEOUT = 60                   # Seconds an idle connection is considered reusable (servers will close it anyway)
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+
+_pool = {}
+_pool_lock = threading.Lock()
+_dns_cache = {}
+_dns_lock = threading.Lock()
+
+# Record / Replay mode (see wconstants). Query parameters ignored when matching recordings (API key, cache buster)
+mode = wconstants.httpMode
+recordings_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), wconstants.RECORDINGS_FOLDER)
+IGNORED_PARAMS = ("appid", "_")
+_random = random.Random(wconstants.replaySeed)
+
+
+def resolve(host, port):
+    # Cached getaddrinfo(). Slow Wi-Fi / DNS on RPi makes this worth it
+    now = time.time()
+    with _dns_lock:
+        entry = _dns_cache.get((host, port))
+        if entry and entry[0] > now:
+            return entry[1]
+
+    addresses = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+    with _dns_lock:
+        _dns_cache[(host, port)] = (now + wconstants.dnsTTL, addresses)
+
+    return addresses
+
+
+def forget(host, port):
+    with _dns_lock:
+        _dns_cache.pop((host, port), None)
+
+
+def _create_connection(address, timeout=None, source_address=None, *args, **kwargs):
+    # Replaces socket.create_connection() on pooled connections to use cached DNS results
+    host, port = address
+    error = None
+    for af, socktype, proto, canonname, sa in resolve(host, port):
+        sock = None
+        try:
+            sock = socket.socket(af, socktype, proto)
+            if isinstance(timeout, (int, float)):
+                sock.settimeout(timeout)
+            if source_address:
+                sock.bind(source_address)
+            sock.connect(sa)
+            return sock
+        except OSError as e:
+            error = e
+            if sock is not None:
+                sock.close()
+
+    # Cached addresses may be outdated. Resolve again next time
+    forget(host, port)
+    if error is None:
+        error = OSError("getaddrinfo returns an empty list")
+    raise error
+
+
+def _get_connection(scheme, host, port, timeout):
+    key = (scheme, host, port)
+    now = time.time()
+
+    with _pool_lock:
+        idle = _pool.get(key, [])
+        while idle:
+            conn, since = idle.pop()
+            if now - since < IDLE_TIMEOUT and conn.sock is not None:
+                conn.timeout = timeout
+                conn.sock.settimeout(timeout)
+                return key, conn, True
+            conn.close()
+
+    if scheme == "https":
+        conn = http.client.HTTPSConnection(host, port, timeout=timeout)
+    else:
+        conn = http.client.HTTPConnection(host, port, timeout=timeout)
+    conn._create_connection = _create_connection
+
+    return key, conn, False
+
+
+def _release_connection(key, conn):
+    with _pool_lock:
+        idle = _pool.setdefault(key, [])
+        if len(idle) < MAX_IDLE:
+            idle.append((conn, time.time()))
+            return
+    conn.close()
+
+
+def close_all():
+    with _pool_lock:
+        for idle in _pool.values():
+            for conn, since in idle:
+                conn.close()
+        _pool.clear()
+
+
+def cache_buster(url):
+    parts = urllib.parse.urlsplit(url)
+    query = (parts.query + "&" if parts.query else "") + "_=" + str(int(time.time()))
+    return urllib.parse.urlunsplit((parts.scheme, parts.netloc, parts.path, query, parts.fragment))
+
+
+class Response:
+    """ File-like response. Body is transparently decompressed. Connection returns to pool when closed """
+
+    def __init__(self, url, resp, key, conn):
+        self.url = url
+        self.status = resp.status
+        self.reason = resp.reason
+        self.headers = resp.headers
+        self._resp = resp
+        self._key = key
+        self._conn = conn
+        self._buffer = b""
+        self._eof = False
+        encoding = (resp.getheader("Content-Encoding") or "").lower()
+        if encoding == "gzip":
+            self._zlib = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif encoding == "deflate":
+            self._zlib = zlib.decompressobj()
+        else:
+            self._zlib = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def getheader(self, name, default=None):
+        return self._resp.getheader(name, default)
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            data = self._buffer + self._decompress(self._resp.read())
+            self._buffer = b""
+            return data + self._flush()
+
+        while len(self._buffer) < size and not self._eof:
+            chunk = self._resp.read(8192)
+            if chunk:
+                self._buffer += self._decompress(chunk)
+            else:
+                self._buffer += self._flush()
+        data = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return data
+
+    def _decompress(self, chunk):
+        if self._zlib is None:
+            return chunk
+        return self._zlib.decompress(chunk)
+
+    def _flush(self):
+        self._eof = True
+        if self._zlib is None:
+            return b""
+        return self._zlib.flush()
+
+    def close(self):
+        # Connection can be reused only if the whole body has been read (otherwise, it is just closed)
+        if self._conn is not None:
+            if self._resp.isclosed() and not self._resp.will_close:
+                _release_connection(self._key, self._conn)
+            else:
+                self._resp.close()
+                self._conn.close()
+            self._conn = None
+
+
+def urlopen(url, endpoint=None, timeout=None, headers=None):
+    # Use timeout and cache settings defined for each endpoint (see wconstants), unless timeout is given
+    if timeout is None:
+        timeout = wconstants.httpTimeouts.get(endpoint, wconstants.httpTimeout)
+    if endpoint in wconstants.httpNoCache:
+        url = cache_buster(url)
+    reqHeaders = dict(wconstants.headers)
+    if headers:
+        reqHeaders.update(headers)
+
+    if mode == wconstants.HTTP_REPLAY:
+        return replay(url, timeout)
+
+    start = time.time()
+    if mode == wconstants.HTTP_RECORD:
+        try:
+            response = _open(url, timeout, reqHeaders)
+        except urllib.error.HTTPError as e:
+            record(url, e.code, {}, b"", start)
+            raise
+        with response:
+            body = response.read()
+        return record(url, response.status, dict(response.headers), body, start)
+
+    return _open(url, timeout, reqHeaders)
+
+
+def _open(url, timeout, reqHeaders):
+
+    for i in range(MAX_REDIRECTS + 1):
+        parts = urllib.parse.urlsplit(url)
+        scheme = parts.scheme.lower()
+        port = parts.port or (443 if scheme == "https" else 80)
+        path = (parts.path or "/") + ("?" + parts.query if parts.query else "")
+
+        resp = None
+        key = conn = None
+        for attempt in range(2):
+            key, conn, reused = _get_connection(scheme, parts.hostname, port, timeout)
+            try:
+                conn.request("GET", path, headers=reqHeaders)
+                resp = conn.getresponse()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # Server closed an idle pooled connection. Retry once with a fresh one
+                conn.close()
+                if not reused or attempt > 0:
+                    raise
+            except:
+                conn.close()
+                raise
+
+        location = resp.getheader("Location")
+        if resp.status in REDIRECT_CODES and location:
+            resp.read()
+            Response(url, resp, key, conn).close()
+            url = urllib.parse.urljoin(url, location)
+            continue
+
+        if resp.status >= 400:
+            resp.read()
+            Response(url, resp, key, conn).close()
+            raise urllib.error.HTTPError(url, resp.status, resp.reason, resp.headers, None)
+
+        return Response(url, resp, key, conn)
+
+    raise urllib.error.URLError("Too many redirects: " + url)
+
+
+def get(url, endpoint=None, timeout=None, headers=None):
+    with urlopen(url, endpoint=endpoint, timeout=timeout, headers=headers) as response:
+        return response.read()
+
+
+class RecordedResponse(io.BytesIO):
+    """ File-like response served from a recording (see record() / replay()) """
+
+    def __init__(self, url, status, headers, body):
+        super().__init__(body)
+        self.url = url
+        self.status = status
+        self.headers = headers
+
+    def getheader(self, name, default=None):
+        for key, value in self.headers.items():
+            if key.lower() == name.lower():
+                return value
+        return default
+
+
+def recording_key(url):
+    # Same source request, same key, no matter the scheme or the ignored params
+    parts = urllib.parse.urlsplit(url)
+    query = [(k, v) for k, v in urllib.parse.parse_qsl(parts.query, keep_blank_values=True) if k not in IGNORED_PARAMS]
+    return parts.netloc + parts.path + ("?" + urllib.parse.urlencode(query) if query else "")
+
+
+def recording_file(key, folder=None):
+    return os.path.join(folder or recordings_folder, hashlib.sha1(key.encode("utf-8")).hexdigest()[:20])
+
+
+def record(url, status, headers, body, start, folder=None):
+    # Save raw response (body is already decompressed) and its metadata, including timing
+    key = recording_key(url)
+    name = recording_file(key, folder)
+    headers = {k: v for k, v in headers.items() if k.lower() not in ("content-encoding", "content-length",
+                                                                    "transfer-encoding", "connection")}
+    meta = {"key": key, "status": status, "headers": headers, "time": start,
+            "elapsed": round(time.time() - start, 3), "size": len(body)}
+    try:
+        os.makedirs(os.path.dirname(name), exist_ok=True)
+        with open(name + ".body", "wb") as file:
+            file.write(body)
+        with open(name + ".json", "w", encoding='UTF-8') as file:
+            json.dump(meta, file, ensure_ascii=False, indent=4)
+    except:
+        print("Error saving recording for", key)
+
+    return RecordedResponse(url, status, headers, body)
+
+
+def load_recording(key, folder=None):
+    # Returns metadata and body, or None if not recorded
+    name = recording_file(key, folder)
+    try:
+        with open(name + ".json", encoding='UTF-8') as file:
+            meta = json.load(file)
+    except:
+        return None, None
+    body = b""
+    if os.path.isfile(name + ".body"):
+        with open(name + ".body", "rb") as file:
+            body = file.read()
+
+    return meta, body
+
+
+def replay_fault(errorRate, timeoutRate, rand=_random):
+    # Randomly choose if a replayed request has to fail (and how), to simulate a real connection
+    dice = rand.random()
+    if dice < timeoutRate:
+        return "timeout"
+    elif dice < timeoutRate + errorRate:
+        return "error"
+    return None
+
+
+def replay(url, timeout):
+    key = recording_key(url)
+    meta, body = load_recording(key)
+
+    fault = replay_fault(wconstants.replayErrorRate, wconstants.replayTimeoutRate)
+    if fault == "timeout":
+        time.sleep(timeout)
+        raise socket.timeout("Replayed timeout: " + key)
+
+    if meta is None:
+        raise urllib.error.HTTPError(url, 404, "Not recorded", {}, None)
+
+    latency = wconstants.replayLatency
+    if latency is None:
+        latency = meta.get("elapsed", 0)
+    time.sleep(min(latency, timeout))
+
+    if fault == "error":
+        raise urllib.error.HTTPError(url, 503, "Replayed error", {}, None)
+    elif meta["status"] >= 400:
+        raise urllib.error.HTTPError(url, meta["status"], "Recorded error", {}, None)
+
+    return RecordedResponse(url, meta["status"], meta.get("headers", {}), body)
+
+
+# Retry policies. One per endpoint (or source), created on first use with the values in wconstants.retryPolicies
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+_policies = {}
+_policies_lock = threading.Lock()
+
+
+class NotReady(Exception):
+    """ Raised when calling an endpoint which is waiting to retry or known to be down (circuit open) """
+
+
+class RetryPolicy:
+    """ Jittered exponential backoff, circuit breaker and (optional) hedged requests for one endpoint """
+
+    def __init__(self, name, base=30, maxDelay=30 * 60, threshold=4, openTime=20 * 60, hedge=False):
+        self.name = name
+        self.base = base
+        self.maxDelay = maxDelay
+        self.threshold = threshold
+        self.openTime = openTime
+        self.hedge = hedge
+        self.state = CLOSED
+        self.failures = 0
+        self.nextTry = 0
+        self.probing = 0                # Time the single half-open probe started (0 if none in flight)
+        self.lastSuccess = 0
+        self.lastError = ""
+        self.latencies = collections.deque(maxlen=wconstants.hedgeSamples)
+        self.lock = threading.Lock()
+
+    def ready(self):
+        # Not ready while waiting for next retry or while circuit is open (until it is time to try again)
+        # When it is, only one caller gets through to probe the service. Its success() or failure() lets others in
+        with self.lock:
+            now = time.time()
+            if not self._can_call(now):
+                return False
+            if self.state != CLOSED:
+                self.state = HALF_OPEN
+                self.probing = now
+            return True
+
+    def can_call(self):
+        # Same as ready(), but without taking the probe (to check before calling, not to call)
+        with self.lock:
+            return self._can_call(time.time())
+
+    def _can_call(self, now):
+        if now < self.nextTry:
+            return False
+        # A probe which never finished doesn't block the endpoint forever
+        return not self.probing or now - self.probing > self.openTime
+
+    def success(self, elapsed):
+        with self.lock:
+            self.state = CLOSED
+            self.failures = 0
+            self.nextTry = 0
+            self.probing = 0
+            self.lastSuccess = time.time()
+            self.latencies.append(elapsed)
+
+    def failure(self, error=""):
+        with self.lock:
+            self.failures += 1
+            self.lastError = str(error)
+            self.probing = 0
+            if self.state == HALF_OPEN or self.failures >= self.threshold:
+                # Service is known to be down. Stop calling it for a while
+                self.state = OPEN
+                delay = self.openTime
+            else:
+                delay = min(self.maxDelay, self.base * 2 ** (self.failures - 1))
+            # Jitter, so several stations (or endpoints) don't retry all at once
+            self.nextTry = time.time() + random.uniform(delay / 2, delay)
+
+    def hedge_delay(self):
+        # Fire a second request if the first one is slower than this (latency percentile of recent requests)
+        if not self.hedge or len(self.latencies) < wconstants.hedgeSamples // 2:
+            return None
+        latencies = sorted(self.latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * wconstants.hedgePercentile))]
+
+    def call(self, function, *args, **kwargs):
+        if not self.ready():
+            raise NotReady(self.name + " " + self.status())
+
+        start = time.time()
+        try:
+            delay = self.hedge_delay()
+            if delay is None:
+                result = function(*args, **kwargs)
+            else:
+                result = _hedged(delay, function, *args, **kwargs)
+        except Exception as e:
+            self.failure(e)
+            raise
+        self.success(time.time() - start)
+
+        return result
+
+    def status(self):
+        wait = int(self.nextTry - time.time())
+        if self.state == CLOSED and wait <= 0:
+            return "OK"
+        text = "Down" if self.state == OPEN else "Failing"
+        if wait > 0:
+            text += " (retry in %s)" % ("%im" % (wait // 60) if wait >= 60 else "%is" % wait)
+        return text
+
+
+def _hedged(delay, function, *args, **kwargs):
+    # Keep the first successful result of two equivalent requests, the second one fired only if the first is slow
+    # The other one is closed when it finishes (if it can be, e.g. a Response, so its connection is not leaked)
+    results = queue.Queue()
+    won = []
+    lock = threading.Lock()
+
+    def run():
+        try:
+            value = function(*args, **kwargs)
+        except Exception as e:
+            results.put((False, e))
+            return
+        with lock:
+            first = not won
+            won.append(True)
+        if first:
+            results.put((True, value))
+        elif hasattr(value, "close"):
+            value.close()
+
+    threading.Thread(target=run, daemon=True).start()
+    try:
+        ok, value = results.get(timeout=delay)
+        pending = 0
+    except queue.Empty:
+        threading.Thread(target=run, daemon=True).start()
+        ok, value = results.get()
+        pending = 1
+    if not ok and pending:
+        ok, value = results.get()
+    if not ok:
+        raise value
+
+    return value
+
+
+def policy(endpoint, name=None):
+    # Policies are shared by name (use endpoint and source name to have a different one for each source)
+    name = name or endpoint
+    with _policies_lock:
+        if name not in _policies:
+            _policies[name] = RetryPolicy(name, **wconstants.retryPolicies.get(endpoint, {}))
+        return _policies[name]
+
+
+def policies_status():
+    with _policies_lock:
+        return " / ".join(p.name + ": " + p.status() for p in _policies.values())
+
+
+# API call budgets. One per key, created on first use with the values in wconstants.callBudgets
+_budgets = {}
+_budgets_lock = threading.Lock()
+ledger_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), wconstants.CALLS_LEDGER_FILE)
+
+
+class CallBudget:
+    """ Persistent ledger of the calls made with one API key, with daily and per minute budgets """
+
+    def __init__(self, name, key, daily=1000, perMinute=60, stations=1):
+        self.name = name
+        self.key = hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]   # Not to save the API key itself
+        self.daily = max(1, daily // max(1, stations))
+        self.perMinute = max(1, perMinute // max(1, stations))
+        self.day = ""
+        self.count = 0
+        self.demand = 0
+        self.recent = collections.deque()
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        try:
+            with open(ledger_file, encoding='UTF-8') as file:
+                entry = json.load(file)[self.key]
+            self.day = entry["day"]
+            self.count = entry["count"]
+        except:
+            pass
+        self.new_day()
+
+    def save(self):
+        try:
+            with open(ledger_file, encoding='UTF-8') as file:
+                ledger = json.load(file)
+        except:
+            ledger = {}
+        ledger[self.key] = {"name": self.name, "day": self.day, "count": self.count}
+        try:
+            os.makedirs(os.path.dirname(ledger_file), exist_ok=True)
+            with open(ledger_file + ".tmp", "w", encoding='UTF-8') as file:
+                json.dump(ledger, file, indent=4)
+            os.replace(ledger_file + ".tmp", ledger_file)
+        except:
+            print("Error saving calls ledger")
+
+    def new_day(self):
+        today = time.strftime("%Y-%m-%d", time.gmtime())
+        if self.day != today:
+            self.day = today
+            self.count = 0
+
+    @staticmethod
+    def seconds_left():
+        return 86400 - time.time() % 86400
+
+    def allowed(self):
+        # There is budget left for one more call, both for today and for current minute
+        with self.lock:
+            self.new_day()
+            while self.recent and self.recent[0] < time.time() - 60:
+                self.recent.popleft()
+            return self.count < self.daily and len(self.recent) < self.perMinute
+
+    def spend(self):
+        with self.lock:
+            self.new_day()
+            self.count += 1
+            self.recent.append(time.time())
+            self.save()
+
+    def stretch(self, demand):
+        # Factor to multiply refresh intervals by, so the calls wanted (demand, in calls per second)
+        # fit in what is left of today's budget
+        with self.lock:
+            self.new_day()
+            self.demand = demand
+            remaining = self.daily - self.count
+            if remaining <= 0:
+                return self.seconds_left() * demand + 1
+            return max(1.0, demand * self.seconds_left() / remaining)
+
+    def projected(self):
+        # Calls expected at the end of the day, at the current (stretched) pace
+        demand = self.demand / self.stretch(self.demand) if self.demand else 0
+        return int(self.count + demand * self.seconds_left())
+
+    def status(self):
+        return "%s: %i/%i left, ~%i/day" % (self.name, max(0, self.daily - self.count), self.daily, self.projected())
+
+
+def budget(endpoint, key, name=None):
+    # Budgets are shared by key (all locations and requests using the same API key)
+    with _budgets_lock:
+        if key not in _budgets:
+            _budgets[key] = CallBudget(name or endpoint, key, **wconstants.callBudgets.get(endpoint, {}))
+        return _budgets[key]
+
+
+def budgets_status():
+    with _budgets_lock:
+        return " / ".join(b.status() for b in _budgets.values())
@@ -6,11 +6,16 @@ import sys
 import platform
 import io
 import math
-import urllib.request
+import functools
+import hashlib
 import pygame
 import time
 import traceback
 import utils
+import netutils
+import wconstants
+import imgcache
+import wbundle
 
 
 def init_display(size=(None, None), pos=(None, None), hideMouse=True, clearScreen=False,
@@ -74,7 +79,7 @@ def init_display(size=(None, None), pos=(None, None), hideMouse=True, clearScree
 
     if icon is not None:
         try:
-            iconW = pygame.image.load(utils.resource_path(icon))
+            iconW = load_image(utils.resource_path(icon))
             pygame.display.set_icon(iconW)
         except:
             print("Main icon not found!")
@@ -207,28 +212,214 @@ def load_font(folder, font, fsize, fbold=0):
     return fontObj
 
 
+_icon_indexes = {}
+_icon_missing = set()
+
+
+def index_icons(folders, extension=".png"):
+    # Build icons indexes (see utils.build_icon_index), so loading icons needs no path resolution nor file checks
+    for folder in folders:
+        _icon_indexes[(folder, extension)] = utils.build_icon_index(folder, extension)
+
+
+def icon_path(code, folder, extension=".png"):
+    if (folder, extension) not in _icon_indexes:
+        index_icons([folder], extension)
+    index = _icon_indexes[(folder, extension)]
+    path = index.get(str(code))
+    if path is None:
+        path = index[None]
+        if (folder, code) not in _icon_missing:
+            # Warn just once
+            _icon_missing.add((folder, code))
+            print("Icon not found. Loading default icon instead. Code:", folder + str(code))
+
+    return path
+
+
+def to_display(surface):
+    # Same pixel format than the display (once, when loaded), so blitting needs no conversion at all
+    # Until the display is set (or if conversion fails, e.g. from a worker thread), surface is left as it is
+    if surface is None or pygame.display.get_surface() is None:
+        return surface
+    try:
+        if surface.get_flags() & pygame.SRCALPHA:
+            return surface.convert_alpha()
+        return surface.convert()
+    except:
+        print("Error converting surface to display format")
+        print(traceback.format_exc())
+        return surface
+
+
 def load_icon(code, folder, extension=".png"):
     icon = None
 
+    path = icon_path(code, folder, extension)
+    if path is not None:
+        try:
+            icon = to_display(load_image(path))
+        except:
+            print("Error loading icon. Code:", folder + str(code))
+            print(traceback.format_exc())
+
+    return icon
+
+
+_prepared_sizes = None
+
+
+def prepared_path(path, size):
+    # Where wassets.py saves the image in path, scaled to size
+    name = os.path.splitext(os.path.relpath(path, utils.resource_path(".")))[0]
+    return os.path.join(utils.resource_path(wconstants.ASSETS_FOLDER), "%s_%ix%i.png" % (name, size[0], size[1]))
+
+
+def load_image(path):
+    # From assets bundle if there (see wbundle), or from its own file
+    data = wbundle.read(path)
+    if data is not None:
+        return pygame.image.load(data, os.path.basename(path))
+    return pygame.image.load(path)
+
+
+def load_prepared(path, size):
+    # Image in path already scaled to size (see wassets.py), or None if not prepared (or outdated)
+    prepared = prepared_path(path, size)
+    bundle = wbundle.get_bundle()
+    if bundle is not None and bundle.mtime(prepared) is not None:
+        # Both were checked when the bundle was opened. No need to access the disk
+        original = bundle.mtime(path)
+        if original is None:
+            original = os.path.getmtime(path)
+        if bundle.mtime(prepared) >= original:
+            return load_image(prepared)
+    if os.path.isfile(prepared) and os.path.getmtime(prepared) >= os.path.getmtime(path):
+        try:
+            return pygame.image.load(prepared)
+        except:
+            print("Error loading prepared image", prepared)
+            print(traceback.format_exc())
+    return None
+
+
+def image_size(path):
+    # Original size of image, as saved by wassets.py (so image doesn't need to be decoded), or None
+    global _prepared_sizes
+    if _prepared_sizes is None:
+        _prepared_sizes = utils.read_json_file(utils.resource_path(wconstants.ASSETS_INDEX_FILE)) or {}
+    size = _prepared_sizes.get(os.path.relpath(path, utils.resource_path(".")))
+    return tuple(size) if size else None
+
+
+icon_cache = utils.LRUCache(wconstants.iconCacheSize, "Icon cache")
+
+
+def get_icon(code, folder, size=None):
+    # Decoded (and scaled to size, if given) icons, shared by all draw sites. Don't modify them!
+    key = (str(code), folder, size)
+    icon = icon_cache.get(key)
+    if icon is None:
+        if size is None:
+            icon = load_icon(code, folder)
+        else:
+            # Prepared icons are used as they are. Otherwise, original is scaled
+            path = icon_path(code, folder)
+            icon = to_display(load_prepared(path, size)) if path is not None else None
+            if icon is None:
+                icon = get_icon(code, folder)
+                if icon is None:
+                    # Neither the icon nor its fallback are there: keep the layout, showing nothing
+                    icon = to_display(pygame.Surface(size, pygame.SRCALPHA))
+                elif icon.get_size() != size:
+                    icon = pygame.transform.smoothscale(icon, size)
+        if icon is not None:
+            icon_cache.put(key, icon, surface_bytes(icon))
+
+    return icon
+
+
+def icon_size(code, folder):
+    # Original size of the icon (a square one if missing, so it is laid out as most icons)
+    path = icon_path(code, folder)
+    size = image_size(path) if path is not None else None
+    if size is None:
+        icon = get_icon(code, folder)
+        size = icon.get_size() if icon is not None else (1, 1)
+    return size
+
+
+bkg_cache = utils.LRUCache(wconstants.bkgCacheSize, "Background cache")
+
+
+def _trim_bkg_folder(folder):
+    # Oldest used backgrounds are deleted beyond wconstants.bkgDiskCacheSize
+    files = [os.path.join(folder, name) for name in os.listdir(folder) if name.endswith(".raw")]
+    files.sort(key=os.path.getmtime, reverse=True)
+    total = 0
+    for name in files:
+        total += os.path.getsize(name)
+        if total > wconstants.bkgDiskCacheSize:
+            os.remove(name)
+
+
+def load_background(path, size, dims=()):
+    # Background image scaled to size and dimmed as in dims: ((rect, darken_factor, color_filter), ...)
+    # Final result is cached, in memory and as raw pixels on disk (no decoding nor scaling next time). Don't modify it!
+    key = (path, tuple(size), tuple((tuple(rect), factor, tuple(pygame.Color(color))) for rect, factor, color in dims))
+    bkg = bkg_cache.get(key)
+    if bkg is not None:
+        return bkg
+
+    folder = utils.resource_path(wconstants.BKG_CACHE_FOLDER)
+    raw = os.path.join(folder, hashlib.sha1(repr(key).encode("utf-8")).hexdigest() + ".raw")
     try:
-        # Use .convert_alpha() if you find troubles with transparency
-        icon = pygame.image.load(utils.resource_path(folder) + str(code) + extension)
+        if os.path.isfile(raw) and os.path.getmtime(raw) >= os.path.getmtime(path):
+            with open(raw, "rb") as file:
+                bkg = pygame.image.fromstring(file.read(), key[1], "RGB")
+            os.utime(raw)
     except:
-        print("Error loading icon. Loading default icon instead. Code:", folder + code)
+        print("Error loading cached background", raw)
         print(traceback.format_exc())
 
-    return icon
+    if bkg is None:
+        bkg = load_prepared(path, key[1]) or load_image(path)
+        if bkg.get_size() != key[1]:
+            bkg = pygame.transform.smoothscale(bkg, key[1])
+        for rect, factor, color in dims:
+            dim(bkg, factor, color, rect, False)
+        try:
+            os.makedirs(folder, exist_ok=True)
+            with open(raw + ".tmp", "wb") as file:
+                file.write(pygame.image.tostring(bkg, "RGB"))
+            os.replace(raw + ".tmp", raw)
+            _trim_bkg_folder(folder)
+        except:
+            print("Error saving cached background", raw)
+            print(traceback.format_exc())
+
+    bkg = to_display(bkg)
+    bkg_cache.put(key, bkg, surface_bytes(bkg))
 
+    return bkg
 
-def load_url_image(url, headers='', timeout=10):
+
+def load_url_image(url, headers='', timeout=10, width=None, cache=True):
+    # Safe to be called from worker threads. Set width to get the image already scaled (keeping aspect ratio)
+    # If cache, picture is taken from / saved into the on-disk image cache (see imgcache)
     image = None
 
     try:
-        with urllib.request.urlopen(url, timeout=timeout) as pic:
-            image_str = pic.read()
-            image_file = io.BytesIO(image_str)
-            # Use .convert_alpha() if you find troubles with transparency
-            image = pygame.image.load(image_file)
+        if cache:
+            return to_display(imgcache.get_image(url, headers=headers or None, timeout=timeout, width=width))
+        image_str = netutils.get(url, timeout=timeout, headers=headers or None)
+        image_file = io.BytesIO(image_str)
+        image = pygame.image.load(image_file)
+        if width is not None:
+            ix, iy = image.get_size()
+            if ix != width:
+                image = pygame.transform.smoothscale(image, (width, int(iy * (width / ix))))
+        image = to_display(image)
     except:
         print("Error getting image from URL", url)
         print(traceback.format_exc())
@@ -236,35 +427,94 @@ def load_url_image(url, headers='', timeout=10):
     return image
 
 
+text_cache = utils.LRUCache(wconstants.textCacheSize, "Text cache")
+
+
+def surface_bytes(surface):
+    return surface.get_width() * surface.get_height() * surface.get_bytesize()
+
+
+def render_text(text, font, color, antialias=True):
+    # Rendered texts are cached (most labels are the same from one redraw to the next). Don't modify them!
+    key = (text, font, tuple(pygame.Color(color)), antialias)
+    rtext = text_cache.get(key)
+    if rtext is None:
+        rtext = to_display(font.render(text, antialias, color))
+        text_cache.put(key, rtext, surface_bytes(rtext))
+
+    return rtext
+
+
+def render_outlined(text, font, fcolor, ocolor, oalpha, owidth, shadow=False):
+    # Text over its outline (around the text) or shadow (to bottom right), in a single surface (cached)
+    # Colors are premultiplied by alpha, so pieces can be composited first and then blitted at once, giving the same
+    # result than blitting them one by one. Blit it with special_flags=pygame.BLEND_PREMULTIPLIED!
+    key = (text, font, tuple(pygame.Color(fcolor)), True, tuple(pygame.Color(ocolor)), oalpha, owidth, shadow)
+    srf = text_cache.get(key)
+    if srf is None:
+        rtext = render_text(text, font, fcolor).premul_alpha()
+        otext = render_text(text, font, ocolor).copy()
+        otext.fill((255, 255, 255, oalpha), special_flags=pygame.BLEND_RGBA_MULT)
+        otext = otext.premul_alpha()
+        rtx, rty = rtext.get_size()
+        if shadow:
+            offsets = [(owidth, owidth)]
+            pos = (0, 0)
+            size = (rtx + owidth, rty + owidth)
+        else:
+            offsets = [(0, 0), (0, owidth * 2), (owidth * 2, 0), (owidth * 2, owidth * 2),
+                       (0, owidth), (owidth * 2, owidth), (owidth, 0), (owidth, owidth * 2)]
+            pos = (owidth, owidth)
+            size = (rtx + owidth * 2, rty + owidth * 2)
+        srf = pygame.Surface(size, pygame.SRCALPHA)
+        srf.fill((0, 0, 0, 0))
+        for offset in offsets:
+            srf.blit(otext, offset, special_flags=pygame.BLEND_PREMULTIPLIED)
+        srf.blit(rtext, pos, special_flags=pygame.BLEND_PREMULTIPLIED)
+        srf = to_display(srf)
+        text_cache.put(key, srf, surface_bytes(srf))
+
+    return srf
+
+
+@functools.lru_cache(maxsize=wconstants.textSizeCache)
+def text_size(text, font):
+    # Measure text without rendering it
+    return font.size(text)
+
+
+def clear_text_caches():
+    # Caches are keyed by font: call it when fonts are loaded again, so old fonts (and their texts) are released
+    text_cache.clear()
+    text_size.cache_clear()
+    atlas_cache.clear()
+
+
 def draw_text(screen, text, font, fcolor=pygame.Color("white"), blit=False, x=0, y=0, outline=None, owidth=0,
               ocolor=(64, 64, 64), oalpha=64):
 
-    rtext = font.render(text, True, fcolor)
+    if not blit:
+        # Just measuring: nothing is rendered
+        rtx, rty = text_size(text, font)
+        return rtx + owidth * 2, rty + owidth
+
+    rtext = render_text(text, font, fcolor)
     rtx, rty = rtext.get_size()
 
     if blit:
 
         if outline == "Outline":
-            otext = font.render(text, True, ocolor)
-            otext.set_alpha(oalpha)  # Worked once, but now it doesn't... don't know why
+            # Text and its outline, composited once (and cached): just one blit
             if owidth == 0: owidth = int(max(2, rtx / max(len(text), 1) * 0.03, 1))
-            screen.blit(otext, (x - owidth, y - owidth))
-            screen.blit(otext, (x - owidth, y + owidth))
-            screen.blit(otext, (x + owidth, y - owidth))
-            screen.blit(otext, (x + owidth, y + owidth))
-            # These next four blits are not strictly necessary, though look better (comment to improve CPU usage)
-            screen.blit(otext, (x - owidth, y))
-            screen.blit(otext, (x + owidth, y))
-            screen.blit(otext, (x, y - owidth))
-            screen.blit(otext, (x, y + owidth))
+            screen.blit(render_outlined(text, font, fcolor, ocolor, oalpha, owidth, False), (x - owidth, y - owidth),
+                        special_flags=pygame.BLEND_PREMULTIPLIED)
 
         elif outline == "Outrect":
             dim(screen, oalpha, ocolor, (x - owidth, y - owidth, rtx + owidth * 2, rty + owidth))
 
         elif outline == "Shadow":
-            otext = font.render(text, True, ocolor)
-            otext.set_alpha(oalpha)  # Worked once, but now it doesn't... don't know why
-            screen.blit(otext, (x + owidth, y + owidth))
+            screen.blit(render_outlined(text, font, fcolor, ocolor, oalpha, owidth, True), (x, y),
+                        special_flags=pygame.BLEND_PREMULTIPLIED)
 
         elif outline == "FadeIn":
             rect = (x, y, rtx, rty)
@@ -282,7 +532,7 @@ def draw_text(screen, text, font, fcolor=pygame.Color("white"), blit=False, x=0,
             img = screenshot(srf, (0, 0, rect[2], rect[3]))
             fade_out(screen, img, rect, color_filter=(ocolor))
 
-        if outline != "FadeOut":
+        if outline not in ("FadeOut", "Outline", "Shadow"):
             screen.blit(rtext, (x, y))
 
     rtx += owidth * 2
@@ -291,6 +541,88 @@ def draw_text(screen, text, font, fcolor=pygame.Color("white"), blit=False, x=0,
     return rtx, rty
 
 
+class DigitAtlas(object):
+    """Digits and separator (lit and dark) of a font, rendered once into a single surface"""
+
+    # Clock is composed by blitting glyphs from the atlas, instead of rendering texts (see digit_atlas())
+    # Digits are drawn as draw_text() would do with outline; separator, without it (as the clock does)
+
+    def __init__(self, font, fcolor, dcolor, outline=None, ocolor=(64, 64, 64), oalpha=64):
+        self.font = font
+        self.fcolor = fcolor
+        self.outline = outline
+        self.ocolor = ocolor
+        self.oalpha = oalpha
+        self.owidth = 0
+        # Glyphs: (surface, offset, blit flags). Outlined ones are premultiplied (see render_outlined())
+        glyphs = {}
+        for char in "0123456789":
+            rtext = render_text(char, font, fcolor)
+            if outline == "Outline":
+                owidth = int(max(2, rtext.get_width() * 0.03, 1))
+                glyphs[char] = (render_outlined(char, font, fcolor, ocolor, oalpha, owidth, False), -owidth,
+                                pygame.BLEND_PREMULTIPLIED)
+            elif outline == "Shadow":
+                glyphs[char] = (render_outlined(char, font, fcolor, ocolor, oalpha, 0, True), 0,
+                                pygame.BLEND_PREMULTIPLIED)
+            else:
+                glyphs[char] = (rtext, 0, 0)
+        glyphs[":"] = (render_text(":", font, fcolor), 0, 0)
+        glyphs["dark"] = (render_text(":", font, dcolor), 0, 0)
+
+        # All glyphs side by side. Pixels are added to a transparent surface, so they are copied as they are
+        self.surface = pygame.Surface((sum(g.get_width() for g, o, f in glyphs.values()),
+                                       max(g.get_height() for g, o, f in glyphs.values())), pygame.SRCALPHA)
+        self.surface.fill((0, 0, 0, 0))
+        self.glyphs = {}
+        x = 0
+        for char, (glyph, offset, flags) in glyphs.items():
+            self.surface.blit(glyph, (x, 0), special_flags=pygame.BLEND_RGBA_ADD)
+            self.glyphs[char] = (pygame.Rect(x, 0, glyph.get_width(), glyph.get_height()), offset,
+                                 text_size(":" if char == "dark" else char, font)[0], flags)
+            x += glyph.get_width()
+        self.surface = to_display(self.surface)
+
+    def size(self, text):
+        return sum(self.glyphs[char][2] for char in text), self.font.get_height()
+
+    def draw(self, screen, text, x, y, dark=False):
+        # Blit text (digits and/or separator) at x, y. Returns its size, as draw_text() when measuring
+        if self.outline in ("FadeIn", "FadeOut"):
+            # Animated: not in atlas
+            return draw_text(screen, text, self.font, self.fcolor, True, x, y, self.outline, 0, self.ocolor, self.oalpha)
+
+        tx, ty = self.size(text)
+        if self.outline == "Outrect" and text.strip(":"):
+            dim(screen, self.oalpha, self.ocolor, (x, y, tx, ty))
+        for char in text:
+            area, offset, advance, flags = self.glyphs["dark" if dark and char == ":" else char]
+            screen.blit(self.surface, (x + offset, y + offset), area, special_flags=flags)
+            x += advance
+
+        return tx, ty
+
+
+atlas_cache = utils.LRUCache(wconstants.atlasCacheSize, "Digit atlas cache")
+
+
+def digit_atlas(font, fcolor, dcolor, outline=None, ocolor=(64, 64, 64), oalpha=64):
+    # Built once per font, colors and outline style
+    key = (font, tuple(pygame.Color(fcolor)), tuple(pygame.Color(dcolor)), outline, tuple(pygame.Color(ocolor)), oalpha)
+    atlas = atlas_cache.get(key)
+    if atlas is None:
+        atlas = DigitAtlas(font, fcolor, dcolor, outline, ocolor, oalpha)
+        atlas_cache.put(key, atlas, surface_bytes(atlas.surface))
+    return atlas
+
+
+def draw_text_at(screen, text, font, fcolor, x, y, halign=0.0, valign=0.0, **kwargs):
+    # Layout and draw in one call. Text is aligned to (x, y) as given by halign / valign (0: left / top,
+    # 0.5: center, 1: right / bottom). Returns text size, as draw_text()
+    tx, ty = text_size(text, font)
+    return draw_text(screen, text, font, fcolor, True, x - tx * halign, y - ty * valign, **kwargs)
+
+
 def fade_in(screen, img, rect, period=1.2, color_filter=(0, 0, 0)):
     clock = pygame.time.Clock()
     darken_factor = 255
@@ -455,15 +787,129 @@ def screenshot(screen, rect):
     return img
 
 
-def prepare_area(screen, img, rect):
-    if not img:
-        # Capture "area" background (if not already captured and showBkg)
-        img = screenshot(screen, rect)
-    else:
-        # ... or blit "area" to erase previous values
-        screen.blit(img, rect)
-
-    return img
+class Compositor(object):
+    """Background layer plus named content layers, redrawn only where needed"""
+
+    # Layers are drawing functions (returning the rect they actually drew), painted in the order they were added
+    # When a layer changes, the area it covered before and after is restored from the background, and every
+    # visible layer touching it is redrawn there (clipped), so overlapping layers need no special handling
+
+    def __init__(self, screen):
+        self.screen = screen
+        self.background = None
+        self.layers = {}
+        self.order = []
+        self.dirty = set()
+        self.damaged = []
+        self.pending = None
+
+    def set_background(self, background):
+        # Whole screen (background image, dimmed areas, ...). Everything will be redrawn on top of it
+        self.background = background
+        self.damaged = [self.screen.get_rect()]
+
+    def add_layer(self, name, draw, visible=True):
+        self.layers[name] = {"draw": draw, "rect": None, "visible": visible}
+        self.order.append(name)
+
+    def show(self, name, visible=True):
+        layer = self.layers[name]
+        if layer["visible"] != visible:
+            layer["visible"] = visible
+            if visible:
+                self.dirty.add(name)
+            elif layer["rect"] is not None:
+                self.damaged.append(layer["rect"])
+                layer["rect"] = None
+
+    def visible(self, name):
+        return self.layers[name]["visible"]
+
+    def invalidate(self, name=None, area=None):
+        # Redraw layer (all of them if no name). If area is given, only that part of the layer changed
+        if name is None:
+            self.damaged = [self.screen.get_rect()]
+        elif area is not None:
+            self.damaged.append(pygame.Rect(area))
+        else:
+            self.dirty.add(name)
+
+    def measure(self, draw, *args):
+        # Rect a drawing function would draw, without drawing anything
+        clip = self.screen.get_clip()
+        self.screen.set_clip((0, 0, 0, 0))
+        rect = draw(*args)
+        self.screen.set_clip(clip)
+        return pygame.Rect(rect)
+
+    def compose(self):
+        # Redraw damaged areas and return them (to update display)
+        for name in self.order:
+            layer = self.layers[name]
+            if layer["visible"] and (name in self.dirty or layer["rect"] is None):
+                if layer["rect"] is not None:
+                    self.damaged.append(layer["rect"])
+                layer["rect"] = self.measure(layer["draw"])
+                self.damaged.append(layer["rect"])
+        self.dirty.clear()
+
+        # Overlapping areas are merged, so nothing is painted twice
+        areas = []
+        for rect in self.damaged:
+            rect = pygame.Rect(rect).clip(self.screen.get_rect())
+            if rect.width <= 0 or rect.height <= 0:
+                continue
+            i = rect.collidelist(areas)
+            while i >= 0:
+                rect.union_ip(areas.pop(i))
+                i = rect.collidelist(areas)
+            areas.append(rect)
+        self.damaged = []
+
+        for area in areas:
+            self.screen.set_clip(area)
+            if self.background is not None:
+                self.screen.blit(self.background, area, area)
+            for name in self.order:
+                layer = self.layers[name]
+                if layer["visible"] and layer["rect"] is not None and area.colliderect(layer["rect"]):
+                    layer["rect"] = pygame.Rect(layer["draw"]())
+            self.screen.set_clip(None)
+
+        # A prepared frame (see prerender()) is no longer valid if screen changed below it
+        if self.pending is not None and any(area.collidelist(self.pending[0]) >= 0 for area in areas):
+            self.pending = None
+
+        return areas
+
+    def prerender(self, names, surface):
+        # Compose layers (names) as they will be, but on surface (same size than screen), to show them later at once
+        # with swap(). Layers must draw on surface meanwhile. Nothing changes on screen, nor in layers, until then
+        screen, dirty, damaged = self.screen, self.dirty, self.damaged
+        rects = {name: layer["rect"] for name, layer in self.layers.items()}
+        self.screen, self.dirty, self.damaged = surface, set(names), []
+        try:
+            areas = self.compose()
+            self.pending = areas, {name: layer["rect"] for name, layer in self.layers.items()}, surface
+        finally:
+            self.screen, self.dirty, self.damaged = screen, dirty, damaged
+            for name, rect in rects.items():
+                self.layers[name]["rect"] = rect
+
+        return areas
+
+    def swap(self):
+        # Show prepared frame (just a blit per area). Returns areas to update, or [] if there is no valid frame
+        if self.pending is None:
+            return []
+        areas, rects, surface = self.pending
+        self.pending = None
+        for area in areas:
+            self.screen.blit(surface, area, area)
+        for name, rect in rects.items():
+            self.layers[name]["rect"] = rect
+
+        return areas
 
 
 def default_event_loop():
@@ -43,7 +43,6 @@ dimForecasts = config[section][subsection]["Dim_forecasts"] == "True"
 
 # Other
 dispRatio = float(dispSize[0]) / float(dispSize[1])
-timeout = 20
 debug = False
 
 
@@ -0,0 +1,19 @@
+import os
+import sys
+
+import pytest
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pygame
+
+
+@pytest.fixture(scope="session", autouse=True)
+def display():
+    # Surfaces are converted to display format, so a (hidden) display is needed
+    pygame.init()
+    screen = pygame.display.set_mode((320, 200))
+    yield screen
+    pygame.quit()
@@ -0,0 +1,122 @@
+import pygame
+import pytest
+
+import pgutils
+
+
+class Box:
+    # A layer drawing a filled rect (which can move or change color)
+    def __init__(self, screen, rect, color):
+        self.screen = screen
+        self.rect = pygame.Rect(rect)
+        self.color = color
+        self.draws = 0
+
+    def draw(self):
+        self.draws += 1
+        self.screen.fill(self.color, self.rect)
+        return self.rect
+
+
+@pytest.fixture
+def scene():
+    screen = pygame.Surface((200, 100))
+    background = pygame.Surface((200, 100))
+    background.fill((10, 20, 30))
+    layers = pgutils.Compositor(screen)
+    layers.set_background(background)
+    boxes = {"a": Box(screen, (10, 10, 50, 30), (255, 0, 0)),
+             "b": Box(screen, (40, 20, 50, 30), (0, 255, 0)),
+             "c": Box(screen, (150, 60, 20, 20), (0, 0, 255))}
+    for name, box in boxes.items():
+        layers.add_layer(name, box.draw)
+    assert layers.compose() == [screen.get_rect()]
+    return screen, background, layers, boxes
+
+
+def redrawn(screen, background, boxes):
+    # Same scene, drawn from scratch
+    full = pygame.Surface(screen.get_size())
+    full.blit(background, (0, 0))
+    for box in boxes.values():
+        full.fill(box.color, box.rect)
+    return pygame.image.tostring(full, "RGB")
+
+
+def test_nothing_to_do(scene):
+    screen, background, layers, boxes = scene
+    draws = {name: box.draws for name, box in boxes.items()}
+    assert layers.compose() == []
+    assert {name: box.draws for name, box in boxes.items()} == draws
+
+
+def test_invalidated_layer_and_overlapping_ones_are_redrawn(scene):
+    screen, background, layers, boxes = scene
+    draws = {name: box.draws for name, box in boxes.items()}
+    boxes["a"].color = (255, 255, 0)
+    layers.invalidate("a")
+    assert layers.compose() == [pygame.Rect(10, 10, 50, 30)]
+    # b overlaps a (and is painted on top of it); c is not touched
+    assert boxes["a"].draws > draws["a"] and boxes["b"].draws > draws["b"]
+    assert boxes["c"].draws == draws["c"]
+    assert pygame.image.tostring(screen, "RGB") == redrawn(screen, background, boxes)
+
+
+def test_moved_layer_restores_previous_area(scene):
+    screen, background, layers, boxes = scene
+    boxes["c"].rect = pygame.Rect(160, 70, 20, 20)
+    layers.invalidate("c")
+    assert layers.compose() == [pygame.Rect(150, 60, 30, 30)]
+    assert pygame.image.tostring(screen, "RGB") == redrawn(screen, background, boxes)
+
+
+def test_area_of_layer(scene):
+    screen, background, layers, boxes = scene
+    layers.invalidate("b", (80, 40, 10, 10))
+    assert layers.compose() == [pygame.Rect(80, 40, 10, 10)]
+
+
+def test_hidden_layer(scene):
+    screen, background, layers, boxes = scene
+    layers.show("c", False)
+    assert layers.compose() == [pygame.Rect(150, 60, 20, 20)]
+    del boxes["c"]
+    assert pygame.image.tostring(screen, "RGB") == redrawn(screen, background, boxes)
+
+
+def test_invalidate_all(scene):
+    screen, background, layers, boxes = scene
+    layers.invalidate()
+    assert layers.compose() == [screen.get_rect()]
+
+
+def test_prerender_and_swap(scene):
+    screen, background, layers, boxes = scene
+    before = pygame.image.tostring(screen, "RGB")
+    frame = pygame.Surface(screen.get_size())
+
+    # Layers draw on frame meanwhile. Screen doesn't change until swapped
+    boxes["c"].screen = frame
+    boxes["c"].color = (255, 255, 255)
+    assert layers.prerender(["c"], frame) == [pygame.Rect(150, 60, 20, 20)]
+    assert pygame.image.tostring(screen, "RGB") == before
+    boxes["c"].screen = screen
+
+    assert layers.swap() == [pygame.Rect(150, 60, 20, 20)]
+    assert pygame.image.tostring(screen, "RGB") == redrawn(screen, background, boxes)
+    assert layers.swap() == []
+
+
+def test_prerendered_frame_is_dropped_if_screen_changes_below(scene):
+    screen, background, layers, boxes = scene
+    frame = pygame.Surface(screen.get_size())
+    boxes["c"].screen = frame
+    layers.prerender(["c"], frame)
+    boxes["c"].screen = screen
+
+    layers.invalidate("b")
+    layers.compose()
+    assert layers.pending is not None
+    layers.invalidate("c", (155, 65, 5, 5))
+    layers.compose()
+    assert layers.swap() == []
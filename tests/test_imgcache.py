@@ -0,0 +1,106 @@
+import io
+
+import pygame
+import pytest
+
+import imgcache
+import netutils
+
+URL = "http://pics.example/news.png"
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(imgcache, "folder", str(tmp_path))
+    monkeypatch.setattr(imgcache, "index_file", str(tmp_path / "index.json"))
+    monkeypatch.setattr(imgcache, "_saver", imgcache.utils.JsonSaver(str(tmp_path / "index.json"), 60))
+    monkeypatch.setattr(imgcache, "_index", None)
+    return tmp_path
+
+
+class Server:
+    # Serves one picture, answering conditional requests as a real server would
+    def __init__(self, monkeypatch):
+        picture = pygame.Surface((40, 20))
+        picture.fill((200, 100, 50))
+        data = io.BytesIO()
+        pygame.image.save(picture, data, "news.png")
+        self.body = data.getvalue()
+        self.etag = '"v1"'
+        self.requests = []
+        monkeypatch.setattr(netutils, "urlopen", self.urlopen)
+
+    def urlopen(self, url, endpoint=None, timeout=None, headers=None):
+        self.requests.append(dict(headers or {}))
+        if (headers or {}).get("If-None-Match") == self.etag:
+            return netutils.RecordedResponse(url, 304, {"ETag": self.etag}, b"")
+        return netutils.RecordedResponse(url, 200, {"ETag": self.etag}, self.body)
+
+
+def expire(url):
+    imgcache._index["urls"][url]["checked"] -= imgcache.wconstants.imageCacheFresh + 1
+
+
+def test_fresh_entry_needs_no_request(cache, monkeypatch):
+    server = Server(monkeypatch)
+    assert imgcache.get_image(URL).get_size() == (40, 20)
+    assert imgcache.get_image(URL).get_size() == (40, 20)
+    assert len(server.requests) == 1
+    assert "If-None-Match" not in server.requests[0]
+
+
+def test_stale_entry_is_revalidated(cache, monkeypatch):
+    server = Server(monkeypatch)
+    imgcache.get_image(URL, width=20)
+    expire(URL)
+
+    # Not modified: cached copy (and its scaled variant) is used
+    image = imgcache.get_image(URL, width=20)
+    assert server.requests[1]["If-None-Match"] == '"v1"'
+    assert image.get_size() == (20, 10)
+    assert image.get_at((5, 5))[:3] == (200, 100, 50)
+    assert len(imgcache._index["blobs"]) == 1
+
+    # Modified: new picture replaces it
+    expire(URL)
+    server.etag = '"v2"'
+    picture = pygame.Surface((10, 10))
+    data = io.BytesIO()
+    pygame.image.save(picture, data, "news.png")
+    server.body = data.getvalue()
+    assert imgcache.get_image(URL).get_size() == (10, 10)
+    assert imgcache._index["urls"][URL]["etag"] == '"v2"'
+
+
+def test_cached_copy_is_used_when_server_fails(cache, monkeypatch):
+    server = Server(monkeypatch)
+    imgcache.get_image(URL)
+    expire(URL)
+
+    def down(*args, **kwargs):
+        raise OSError("down")
+
+    monkeypatch.setattr(netutils, "urlopen", down)
+    assert imgcache.get_image(URL).get_size() == (40, 20)
+
+
+def test_index_survives_restart(cache, monkeypatch):
+    server = Server(monkeypatch)
+    imgcache.get_image(URL)
+    monkeypatch.setattr(imgcache, "_index", None)
+    assert imgcache.get_image(URL).get_size() == (40, 20)
+    assert len(server.requests) == 1
+
+
+def test_fresh_hits_do_not_write_index(cache, monkeypatch):
+    Server(monkeypatch)
+    imgcache.get_image(URL, width=20)
+    writes = []
+    monkeypatch.setattr(imgcache.utils, "write_json_file", lambda path, data: writes.append(path))
+    for _ in range(3):
+        assert imgcache.get_image(URL, width=20).get_size() == (20, 10)
+    assert writes == []
+
+    # A new variant is written at once
+    imgcache.get_image(URL, width=10)
+    assert len(writes) == 1
@@ -0,0 +1,172 @@
+import threading
+import time
+
+import pytest
+
+import netutils
+
+
+class Clock:
+    # Replaces time.time() in netutils, so waits can be checked without waiting
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(netutils.time, "time", clock)
+    return clock
+
+
+def failing():
+    raise OSError("down")
+
+
+def test_backoff_and_circuit(clock):
+    policy = netutils.RetryPolicy("test", base=10, maxDelay=100, threshold=3, openTime=600)
+    assert policy.ready() and policy.state == netutils.CLOSED
+
+    # Retries wait (with jitter) base * 2^(failures - 1)
+    policy.failure("error")
+    assert policy.state == netutils.CLOSED and policy.failures == 1
+    assert 1005 <= policy.nextTry <= 1010
+    assert not policy.ready() and not policy.can_call()
+    with pytest.raises(netutils.NotReady):
+        policy.call(lambda: "never called")
+
+    policy.failure("error")
+    assert 1010 <= policy.nextTry <= 1020
+
+    # Circuit opens after threshold consecutive failures
+    policy.failure("error")
+    assert policy.state == netutils.OPEN
+    assert 1300 <= policy.nextTry <= 1600
+    clock.now = 1299
+    assert not policy.ready()
+
+    policy.success(0.1)
+    assert policy.state == netutils.CLOSED and policy.failures == 0 and policy.ready()
+
+
+def test_half_open_lets_a_single_probe_through(clock):
+    policy = netutils.RetryPolicy("test", base=10, threshold=1, openTime=600)
+    policy.failure("error")
+    assert policy.state == netutils.OPEN
+
+    clock.now += 600
+    assert policy.can_call()
+    assert policy.ready() and policy.state == netutils.HALF_OPEN
+    # Only the first caller probes the service
+    assert not policy.ready() and not policy.can_call()
+
+    # A failed probe opens the circuit again
+    policy.failure("still down")
+    assert policy.state == netutils.OPEN and not policy.ready()
+
+    clock.now += 600
+    assert policy.ready()
+    policy.success(0.1)
+    assert policy.state == netutils.CLOSED
+    assert policy.ready() and policy.ready()
+
+
+def test_stuck_probe_does_not_block_forever(clock):
+    policy = netutils.RetryPolicy("test", threshold=1, openTime=600)
+    policy.failure("error")
+    clock.now += 600
+    assert policy.ready()
+    clock.now += 300
+    assert not policy.ready()
+    clock.now += 301
+    assert policy.ready()
+
+
+def test_call_counts_failures_and_successes(clock):
+    policy = netutils.RetryPolicy("test", base=10, threshold=2, openTime=600)
+    with pytest.raises(OSError):
+        policy.call(failing)
+    assert policy.failures == 1 and policy.lastError == "down"
+
+    clock.now = policy.nextTry
+    assert policy.call(lambda x: x * 2, 21) == 42
+    assert policy.failures == 0 and policy.state == netutils.CLOSED
+
+
+def test_hedged_fast_request_is_not_repeated():
+    calls = []
+
+    def request():
+        calls.append(1)
+        return "result"
+
+    assert netutils._hedged(1, request) == "result"
+    assert len(calls) == 1
+
+
+def test_hedged_slow_request_fires_second_one():
+    calls = []
+    release = threading.Event()
+
+    def request():
+        calls.append(1)
+        if len(calls) == 1:
+            # First one stays slow until the second one has answered
+            release.wait(2)
+            return "slow"
+        return "fast"
+
+    assert netutils._hedged(0.05, request) == "fast"
+    release.set()
+    assert len(calls) == 2
+
+
+def test_hedged_keeps_first_success():
+    calls = []
+
+    def request():
+        calls.append(1)
+        if len(calls) == 1:
+            time.sleep(0.1)
+            raise OSError("first failed")
+        time.sleep(0.2)
+        return "second"
+
+    assert netutils._hedged(0.05, request) == "second"
+
+
+def test_hedged_raises_when_both_fail():
+    def request():
+        time.sleep(0.1)
+        raise OSError("down")
+
+    with pytest.raises(OSError):
+        netutils._hedged(0.05, request)
+
+
+def test_hedged_closes_the_slower_response():
+    release = threading.Event()
+    closed = threading.Event()
+
+    class Response:
+        def __init__(self, name):
+            self.name = name
+
+        def close(self):
+            closed.set()
+
+    calls = []
+
+    def request():
+        calls.append(1)
+        if len(calls) == 1:
+            release.wait(2)
+            return Response("slow")
+        return Response("fast")
+
+    assert netutils._hedged(0.05, request).name == "fast"
+    release.set()
+    assert closed.wait(2)
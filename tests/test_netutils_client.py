@@ -0,0 +1,165 @@
+import argparse
+import os
+import random
+import threading
+import time
+import urllib.error
+
+import pytest
+
+import netutils
+import wreplay
+
+# Large enough (and not too compressible) to be read in several chunks
+FEED = b"<rss><channel>" + b"".join(b"<item><title>%s</title></item>" % os.urandom(16).hex().encode()
+                                    for i in range(2000)) + b"</channel></rss>"
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    # Local stand-in server (see wreplay) serving recordings made for the test
+    folder = str(tmp_path)
+    netutils.record("http://news.example/feed.xml", 200, {"Content-Type": "text/xml"}, FEED, time.time(), folder)
+    netutils.record("http://news.example/short.txt", 200, {"Content-Type": "text/plain"}, b"short", time.time(),
+                    folder)
+    netutils.record("http://news.example/old.xml", 302, {"Location": "/news.example/feed.xml"}, b"", time.time(),
+                    folder)
+    netutils.record("http://news.example/loop", 302, {"Location": "/news.example/loop"}, b"", time.time(), folder)
+
+    handler = type("Handler", (wreplay.ReplayHandler,), {})
+    handler.options = argparse.Namespace(folder=folder, latency=0, errors=0, timeouts=0, hang=0, verbose=False)
+    handler.rand = random.Random(0)
+    handler.hosts = ["news.example"]
+    httpd = wreplay.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=httpd.serve_forever, args=(0.05,), daemon=True).start()
+
+    monkeypatch.setattr(netutils, "mode", netutils.wconstants.HTTP_LIVE)
+    netutils.close_all()
+    yield "http://127.0.0.1:%i/news.example/" % httpd.server_address[1]
+    netutils.close_all()
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def connections(monkeypatch):
+    # Whether each request got a reused (pooled) connection
+    reused = []
+    get_connection = netutils._get_connection
+
+    def tracking(*args):
+        key, conn, isReused = get_connection(*args)
+        reused.append(isReused)
+        return key, conn, isReused
+
+    monkeypatch.setattr(netutils, "_get_connection", tracking)
+    return reused
+
+
+def test_gzipped_response_is_decompressed(server):
+    with netutils.urlopen(server + "feed.xml") as response:
+        assert response.getheader("Content-Encoding") == "gzip"
+        assert response.read() == FEED
+
+
+def test_gzipped_response_read_in_chunks(server):
+    with netutils.urlopen(server + "feed.xml") as response:
+        chunks = []
+        while True:
+            chunk = response.read(100)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    assert b"".join(chunks) == FEED
+    assert all(len(chunk) == 100 for chunk in chunks[:-1])
+
+
+def test_small_response_is_not_compressed(server):
+    with netutils.urlopen(server + "short.txt") as response:
+        assert response.getheader("Content-Encoding") is None
+        assert response.read() == b"short"
+
+
+def test_connection_is_reused(server, connections):
+    assert netutils.get(server + "feed.xml") == FEED
+    assert netutils.get(server + "short.txt") == b"short"
+    assert connections == [False, True]
+
+
+def test_connection_is_not_reused_if_body_was_not_read(server, connections):
+    with netutils.urlopen(server + "feed.xml") as response:
+        response.read(10)
+    assert netutils.get(server + "short.txt") == b"short"
+    assert connections == [False, False]
+
+
+def test_closed_pooled_connection_is_replaced(server, connections):
+    netutils.get(server + "short.txt")
+    for idle in netutils._pool.values():
+        for conn, since in idle:
+            # As if server closed it meanwhile
+            conn.sock.close()
+            conn.sock = None
+    assert netutils.get(server + "short.txt") == b"short"
+    assert connections == [False, False]
+
+
+def test_redirect_is_followed(server, connections):
+    with netutils.urlopen(server + "old.xml") as response:
+        assert response.url == server + "feed.xml"
+        assert response.read() == FEED
+    # Same connection for both requests
+    assert connections == [False, True]
+
+
+def test_redirect_loop(server):
+    with pytest.raises(urllib.error.URLError):
+        netutils.get(server + "loop")
+
+
+def test_http_error(server, connections):
+    with pytest.raises(urllib.error.HTTPError) as error:
+        netutils.get(server + "missing.xml")
+    assert error.value.code == 404
+    # Error body was read, so the connection is still usable
+    assert netutils.get(server + "short.txt") == b"short"
+    assert connections == [False, True]
+
+
+def test_dns_results_are_cached(monkeypatch):
+    calls = []
+    getaddrinfo = netutils.socket.getaddrinfo
+
+    def counting(*args):
+        calls.append(args[:2])
+        return getaddrinfo(*args)
+
+    monkeypatch.setattr(netutils.socket, "getaddrinfo", counting)
+    netutils.forget("localhost", 80)
+    first = netutils.resolve("localhost", 80)
+    assert netutils.resolve("localhost", 80) == first
+    assert len(calls) == 1
+
+    # Expired or forgotten (e.g. after failing to connect), it is resolved again
+    netutils._dns_cache[("localhost", 80)] = (time.time() - 1, first)
+    netutils.resolve("localhost", 80)
+    netutils.forget("localhost", 80)
+    netutils.resolve("localhost", 80)
+    assert len(calls) == 3
+
+
+def test_failed_connection_forgets_dns_result(monkeypatch):
+    monkeypatch.setitem(netutils._dns_cache, ("unreachable.example", 80),
+                        (time.time() + 60, [(netutils.socket.AF_INET, netutils.socket.SOCK_STREAM, 0, "",
+                                             ("127.0.0.1", 9))]))
+    with pytest.raises(OSError):
+        netutils._create_connection(("unreachable.example", 80), timeout=1)
+    assert ("unreachable.example", 80) not in netutils._dns_cache
+
+
+def test_cache_buster():
+    url = netutils.cache_buster("http://news.example/feed.xml?lang=en")
+    assert url.startswith("http://news.example/feed.xml?lang=en&_=")
+    assert netutils.cache_buster("http://news.example/feed.xml").startswith("http://news.example/feed.xml?_=")
+    # Ignored when matching recordings
+    assert netutils.recording_key(url) == "news.example/feed.xml?lang=en"
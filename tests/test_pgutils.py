@@ -0,0 +1,96 @@
+import pygame
+import pytest
+
+import pgutils
+import wconstants
+
+TIMES = ["00:00", "07:41", "11:11", "12:59", "20:08"]
+
+
+@pytest.fixture(scope="module", params=[48, 120])
+def font(request):
+    return pgutils.load_font(wconstants.FONTS_FOLDER, wconstants.numberfont, request.param, 0)
+
+
+def draw(function, size=(420, 180)):
+    surface = pygame.Surface(size)
+    surface.fill((30, 60, 90))
+    function(surface)
+    return pygame.image.tostring(surface, "RGB")
+
+
+@pytest.mark.parametrize("outline", [None, "Outline", "Shadow", "Outrect"])
+@pytest.mark.parametrize("hhmm", TIMES)
+def test_digit_atlas_matches_draw_text(font, outline, hhmm):
+    # Clock parts, as display_time() drew them before the atlas
+    atlas = pgutils.digit_atlas(font, (255, 255, 255), (40, 40, 40), outline)
+    for text in hhmm.split(":"):
+        expected = draw(lambda s: pgutils.draw_text(s, text, font, (255, 255, 255), True, 20, 10, outline))
+        assert draw(lambda s: atlas.draw(s, text, 20, 10)) == expected
+        assert atlas.size(text) == pgutils.draw_text(None, text, font, blit=False)
+
+
+@pytest.mark.parametrize("dark", [False, True])
+def test_digit_atlas_separator(font, dark):
+    color = (40, 40, 40) if dark else (255, 255, 255)
+    atlas = pgutils.digit_atlas(font, (255, 255, 255), (40, 40, 40), "Outline")
+    expected = draw(lambda s: pgutils.draw_text(s, ":", font, color, True, 20, 10))
+    assert draw(lambda s: atlas.draw(s, ":", 20, 10, dark=dark)) == expected
+
+
+def test_digit_atlases_are_cached(font):
+    atlas = pgutils.digit_atlas(font, (255, 255, 255), (40, 40, 40), "Shadow")
+    assert pgutils.digit_atlas(font, "white", (40, 40, 40), "Shadow") is atlas
+
+
+def test_clear_text_caches(font):
+    pgutils.render_text("12", font, (255, 255, 255))
+    pgutils.text_size("12", font)
+    pgutils.digit_atlas(font, (255, 255, 255), (40, 40, 40))
+    pgutils.clear_text_caches()
+    assert len(pgutils.text_cache) == 0
+    assert pgutils.text_size.cache_info().currsize == 0
+    assert len(pgutils.atlas_cache) == 0
+
+
+def test_missing_icon_keeps_layout():
+    # Neither the icon nor the "na" fallback exist in that folder
+    folder = "resources/no_such_icons/"
+    assert pgutils.icon_size("01", folder) == (1, 1)
+    icon = pgutils.get_icon("01", folder, (32, 32))
+    assert icon.get_size() == (32, 32)
+    assert icon.get_at((16, 16)).a == 0
+
+
+def blit_one_by_one(screen, text, font, fcolor, x, y, outline, owidth, ocolor, oalpha):
+    # How draw_text() drew outlines and shadows before they were composited (and cached) in a single surface
+    rtext = font.render(text, True, fcolor)
+    otext = font.render(text, True, ocolor)
+    otext.set_alpha(oalpha)
+    if outline == "Shadow":
+        offsets = [(owidth, owidth)]
+    else:
+        if owidth == 0:
+            owidth = int(max(2, rtext.get_width() / max(len(text), 1) * 0.03, 1))
+        offsets = [(-owidth, -owidth), (-owidth, owidth), (owidth, -owidth), (owidth, owidth),
+                   (-owidth, 0), (owidth, 0), (0, -owidth), (0, owidth)]
+    for dx, dy in offsets:
+        screen.blit(otext, (x + dx, y + dy))
+    screen.blit(rtext, (x, y))
+
+
+@pytest.mark.parametrize("outline,owidth", [("Outline", 0), ("Outline", 3), ("Shadow", 0), ("Shadow", 3)])
+@pytest.mark.parametrize("background", [(30, 60, 90), (255, 255, 255), (0, 0, 0)])
+def test_outlined_text_matches_blitting_one_by_one(outline, owidth, background):
+    font = pgutils.load_font(wconstants.FONTS_FOLDER, wconstants.font, 40, 0)
+    args = ("Temp 23º Wq", font, (255, 255, 255))
+    expected = pygame.Surface((400, 100))
+    expected.fill(background)
+    drawn = expected.copy()
+    blit_one_by_one(expected, *args, 20, 20, outline, owidth, (64, 64, 64), 64)
+    pgutils.draw_text(drawn, *args, True, 20, 20, outline, owidth, (64, 64, 64), 64)
+
+    # Just rounding differences
+    expected = pygame.image.tostring(expected, "RGB")
+    drawn = pygame.image.tostring(drawn, "RGB")
+    assert max(abs(a - b) for a, b in zip(expected, drawn)) <= 6
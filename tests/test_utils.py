@@ -0,0 +1,73 @@
+import io
+import tracemalloc
+
+import utils
+
+
+def feed(items):
+    parts = [b"<rss><channel><title>News</title>"]
+    for i in range(items):
+        parts.append(b"<item><title>Title %i</title><description>%s</description></item>" % (i, b"x" * 200))
+        parts.append(b"<other><title>Not an item</title></other>")
+    parts.append(b"</channel><item><title>Not in channel</title></item></rss>")
+    return io.BytesIO(b"".join(parts))
+
+
+def test_iter_xml_items_yields_matching_elements():
+    titles = [item.find("title").text for item in utils.iter_xml_items(feed(5), "channel/item")]
+    assert titles == ["Title %i" % i for i in range(5)]
+
+
+def test_iter_xml_items_can_stop_early():
+    items = utils.iter_xml_items(feed(1000), "channel/item", chunk_size=512)
+    assert [next(items).find("title").text for i in range(3)] == ["Title 0", "Title 1", "Title 2"]
+
+
+def peak_memory(items):
+    stream = feed(items)
+    tracemalloc.start()
+    for item in utils.iter_xml_items(stream, "channel/item"):
+        pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def test_iter_xml_items_memory_does_not_grow_with_feed():
+    # Processed elements (items and their siblings) are dropped from the tree
+    assert peak_memory(20000) < peak_memory(2000) * 1.5
+
+
+def test_json_saver_writes_at_most_once_per_interval(tmp_path, monkeypatch):
+    writes = []
+    monkeypatch.setattr(utils, "write_json_file", lambda path, data: writes.append(data))
+    saver = utils.JsonSaver(str(tmp_path / "cache.json"), 60)
+
+    # Nothing changed: nothing to write
+    assert not saver.save(lambda: {"v": 0})
+
+    saver.change()
+    assert saver.save(lambda: {"v": 1})
+    saver.change()
+    assert not saver.save(lambda: {"v": 2})
+    assert writes == [{"v": 1}]
+
+    # Pending change is written when forced (e.g. on exit), or once interval has passed
+    assert saver.save(lambda: {"v": 2}, force=True)
+    saver.change()
+    saver.saved -= 60
+    assert saver.save(lambda: {"v": 3})
+    assert writes == [{"v": 1}, {"v": 2}, {"v": 3}]
+
+
+def test_json_saver_retries_after_errors(tmp_path, monkeypatch):
+    def fail(path, data):
+        raise OSError("no space left")
+
+    saver = utils.JsonSaver(str(tmp_path / "cache.json"), 0)
+    saver.change()
+    monkeypatch.setattr(utils, "write_json_file", fail)
+    assert not saver.save(lambda: {"v": 1})
+    monkeypatch.undo()
+    assert saver.save(lambda: {"v": 1})
+    assert utils.read_json_file(str(tmp_path / "cache.json")) == {"v": 1}
@@ -0,0 +1,59 @@
+import os
+
+import wbundle
+
+
+def make_files(folder):
+    files = []
+    for name, data in (("a.png", b"first file"), ("b.png", b"second, longer file")):
+        path = os.path.join(str(folder), name)
+        with open(path, "wb") as file:
+            file.write(data)
+        files.append(path)
+    return files
+
+
+def test_build_and_read(tmp_path):
+    files = make_files(tmp_path)
+    path = str(tmp_path / "assets.bundle")
+    assert wbundle.build(path, files) == sum(os.path.getsize(name) for name in files)
+
+    bundle = wbundle.Bundle(path)
+    assert files[0] in bundle and files[1] in bundle
+    assert bundle.read(files[0]).read() == b"first file"
+    assert bundle.read(files[1]).read() == b"second, longer file"
+    assert bundle.read(str(tmp_path / "c.png")) is None
+
+
+def test_changed_files_are_not_read_from_bundle(tmp_path):
+    files = make_files(tmp_path)
+    path = str(tmp_path / "assets.bundle")
+    wbundle.build(path, files)
+
+    # Same size, newer file
+    with open(files[0], "wb") as file:
+        file.write(b"FIRST FILE")
+    os.utime(files[0], (os.path.getmtime(files[0]) + 10,) * 2)
+    # Only in bundle
+    os.remove(files[1])
+
+    bundle = wbundle.Bundle(path)
+    assert files[0] not in bundle
+    assert bundle.read(files[0]) is None
+    assert bundle.mtime(files[0]) is None
+    assert bundle.read(files[1]).read() == b"second, longer file"
+
+
+def test_files_are_checked_when_opened(tmp_path):
+    files = make_files(tmp_path)
+    path = str(tmp_path / "assets.bundle")
+    wbundle.build(path, files)
+    bundle = wbundle.Bundle(path)
+    mtime = os.path.getmtime(files[0])
+
+    # Lookups use the index only: changes are noticed the next time the bundle is opened
+    with open(files[0], "wb") as file:
+        file.write(b"changed")
+    assert bundle.mtime(files[0]) == mtime
+    assert bundle.read(files[0]).read() == b"first file"
+    assert files[0] not in wbundle.Bundle(path)
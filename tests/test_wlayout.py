@@ -0,0 +1,11 @@
+import pytest
+
+import wconstants
+import wlayout
+
+
+@pytest.mark.parametrize("size", [(800, 480), (1024, 600), (1280, 800), (1920, 1080)])
+def test_hourly_width_uses_station_gap(size):
+    xmargin, ymargin, xgap, ygap = wlayout.margins(*size)
+    assert (xmargin, ymargin) == (size[0] * 0.01, size[1] * 0.01)
+    assert wlayout.hourly_width(size[0]) == (size[0] - xgap) / wconstants.hourly_number
@@ -5,8 +5,14 @@ import os
 import math
 import subprocess
 import sys
-import urllib.request
 import json
+import threading
+import time
+import traceback
+import collections
+import xml.etree.ElementTree as ET
+import netutils
+import wutils
 
 
 def resource_path(rel_path):
@@ -39,12 +45,189 @@ def get_CPU_usage(archOS):
     return usage
 
 
-def get_coordinates(url):
+def read_json_file(path):
+
+    data = None
+    try:
+        with open(path, encoding='UTF-8') as file:
+            data = json.load(file)
+    except:
+        pass
+
+    return data
+
+
+def write_json_file(path, data):
+    # Write to a temporary file first, so an interrupted write (e.g. RPi power cut) never leaves a broken file
+
+    folder = os.path.dirname(path)
+    if folder and not os.path.isdir(folder):
+        os.makedirs(folder, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding='UTF-8') as file:
+        json.dump(data, file, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+    return
+
+
+class JsonSaver:
+    """ Writes a JSON file only if its data changed, and not more often than every interval seconds. Thread-safe """
+
+    # To keep SD cards from wearing out with files which change often (e.g. caches)
+
+    def __init__(self, path, interval):
+        self.path = path
+        self.interval = interval
+        self.changed = False
+        self.saved = 0
+        self._lock = threading.Lock()
+
+    def change(self):
+        self.changed = True
+
+    def save(self, data, force=False):
+        # data is a function returning what to save (called only if it is time to save). Returns True if saved
+        with self._lock:
+            if not self.changed or (not force and time.time() - self.saved < self.interval):
+                return False
+            self.changed = False
+            self.saved = time.time()
+            try:
+                write_json_file(self.path, data())
+            except:
+                self.changed = True
+                print("Error saving", self.path)
+                print(traceback.format_exc())
+                return False
+
+        return True
+
+
+class LRUCache:
+    """ Least recently used cache with a total cost cap (e.g. bytes) and hit / miss counters. Thread-safe """
+
+    def __init__(self, maxCost, name=""):
+        self.name = name
+        self.maxCost = maxCost
+        self.cost = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key, value, cost=1):
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.cost -= old[1]
+            if cost > self.maxCost:
+                return value
+            self._items[key] = (value, cost)
+            self.cost += cost
+            while self.cost > self.maxCost:
+                self.cost -= self._items.popitem(last=False)[1][1]
+        return value
+
+    def pop(self, key, default=None):
+        with self._lock:
+            item = self._items.pop(key, None)
+            if item is None:
+                return default
+            self.cost -= item[1]
+            return item[0]
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.cost = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return "%s: %i items, %iKB, %i%% hits" % (self.name, len(self._items), self.cost // 1024,
+                                                 100 * self.hits // total if total else 0)
+
+
+def build_icon_index(folder, extension=".png", fallback="na"):
+    # {icon code: file path} for all icons in folder. Codes listed in weather-icons-codes.xml but missing in folder
+    # are resolved to the corresponding day icon (if it is a night icon) or to fallback. None key is the fallback
+
+    path = resource_path(folder)
+    try:
+        files = os.listdir(path)
+    except:
+        files = []
+    index = {name[:-len(extension)]: path + name for name in files if name.endswith(extension)}
+
+    default = index.get(fallback)
+    codes = []
+    if "weather-icons-codes.xml" in files:
+        try:
+            codes = [code.get("number") for code in ET.parse(path + "weather-icons-codes.xml").iter("code")]
+        except:
+            print("Error reading", path + "weather-icons-codes.xml")
+    for code in set(codes) | set(wutils.NIGHT_ICONS.values()):
+        if code not in index:
+            index[code] = index.get(wutils.DAY_ICONS.get(code), default)
+    index[None] = default
+
+    return index
+
+
+def iter_xml_items(stream, path, chunk_size=4096):
+    # Yields the elements found at path (relative to root, e.g. "channel/item") while reading the stream, chunk by chunk.
+    # Elements are removed from the tree once processed (matching or not), so only the one being read is kept in memory.
+    # Caller can stop (and close the stream) as soon as it has enough
+
+    parser = ET.XMLPullParser(events=("start", "end"))
+    tags = path.split("/")
+    depth = len(tags) + 1
+    stack = []
+    done = False
+    while not done:
+        chunk = stream.read(chunk_size)
+        if chunk:
+            parser.feed(chunk)
+        else:
+            parser.close()
+            done = True
+        for event, elem in parser.read_events():
+            if event == "start":
+                stack.append(elem)
+            else:
+                if len(stack) <= depth:
+                    # Elements below path depth are kept until their ancestor at that depth is done
+                    if len(stack) == depth and [e.tag for e in stack[1:]] == tags:
+                        yield elem
+                    elem.clear()
+                    if len(stack) > 1:
+                        stack[-2].remove(elem)
+                stack.pop()
+
+    return
+
+
+def get_coordinates(url, timeout=10):
 
     coordinates = []
     try:
-        with urllib.request.urlopen(url) as data:
-            resp = json.loads(data.read().decode('utf8'))
+        resp = json.loads(netutils.get(url, timeout=timeout).decode('utf8'))
 
         for i in range(20):
             try:
@@ -57,12 +240,11 @@ def get_coordinates(url):
     return coordinates
 
 
-def get_location_by_ip(url):
+def get_location_by_ip(url, timeout=5):
 
     ret = []
     try:
-        with urllib.request.urlopen(url) as data:
-            resp = json.loads((data.read().decode('utf8')))
+        resp = json.loads(netutils.get(url, timeout=timeout).decode('utf8'))
 
         if resp["status"] == "success":
             ret = [resp["city"], resp["regionName"], resp["country"], resp["lat"], resp["lon"]]
@@ -0,0 +1,134 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Prepares icons and backgrounds for a screen resolution, so the station loads them already scaled
+# It saves every icon (all icon sets, moon, sun signs and alert) at all sizes the layout uses for that resolution
+# (see wlayout), and backgrounds at screen size, into ASSETS_FOLDER (see wconstants). Original sizes are saved too.
+# Outdated files (older than their original image) are ignored by the station, so just run it again.
+#
+#   python wassets.py                   # Resolution in settings
+#   python wassets.py --size 1024x600   # Use it if running in full screen, with your monitor resolution
+#   python wassets.py --bundle          # Also pack resources and prepared files into a single file (see wbundle)
+
+import argparse
+import glob
+import os
+import pygame
+import settings
+import wconstants
+import wlayout
+import pgutils
+import utils
+import wbundle
+
+
+def icon_files(folder):
+    # All icon files in folder (several codes may share the same file)
+    return sorted(set(path for path in utils.build_icon_index(folder).values() if path is not None))
+
+
+def icon_sizes(size):
+    # {image file: set of sizes it is drawn at} for screen size
+    xmax, ymax = size
+    subwinWidth = wlayout.hourly_width(xmax)
+    sizes = {}
+
+    def add(path, variant):
+        sizes.setdefault(path, set()).add(variant)
+
+    for folder in sorted(glob.glob(utils.resource_path(wconstants.ICON_FOLDER) + "*" + os.path.sep)):
+        iconSet = os.path.basename(folder[:-1])[len(os.path.basename(wconstants.ICON_FOLDER)):] + "/"
+        iconScaleC, iconScaleF, _, _, _ = wlayout.icon_scales(ymax, iconSet)
+        for path in icon_files(wconstants.ICON_FOLDER + iconSet):
+            original = original_size(path)
+            add(path, wlayout.current_icon_size(original, iconScaleC))
+            add(path, wlayout.daily_icon_size(original, iconScaleF))
+            add(path, wlayout.hourly_icon_size(original, subwinWidth, iconSet))
+        # Moon + weather icons (at night) are scaled according to current conditions icon of the selected set
+        for path in icon_files(wconstants.MOON_W_FOLDER):
+            add(path, wlayout.moon_w_icon_size(original_size(path), iconScaleC))
+
+    _, _, moonIconScale, sunsignIconScale, alertIconScale = wlayout.icon_scales(ymax, None)
+    for path in icon_files(wconstants.MOON_FOLDER):
+        add(path, wlayout.current_icon_size(original_size(path), moonIconScale))
+        add(path, wlayout.header_moon_size(sunsignIconScale))
+    for path in icon_files(wconstants.SUNSIGNS_FOLDER):
+        add(path, wlayout.sunsign_icon_size(original_size(path), sunsignIconScale))
+    add(pgutils.icon_path(wconstants.ALERT_ICON, wconstants.ALERT_ICONFOLDER), wlayout.alert_icon_size(alertIconScale))
+
+    for path in glob.glob(utils.resource_path(wconstants.BKG_FOLDER) + "*" + wconstants.BKG_EXT):
+        add(path, (xmax, ymax))
+
+    return sizes
+
+
+_originals = {}
+
+
+def original_size(path):
+    if path not in _originals:
+        _originals[path] = pygame.image.load(path).get_size()
+    return _originals[path]
+
+
+def prepare(sizes, force=False):
+    saved = skipped = 0
+    for path in sorted(sizes):
+        image = None
+        for size in sorted(sizes[path]):
+            prepared = pgutils.prepared_path(path, size)
+            if not force and os.path.isfile(prepared) and os.path.getmtime(prepared) >= os.path.getmtime(path):
+                skipped += 1
+                continue
+            if image is None:
+                image = pygame.image.load(path)
+                _originals[path] = image.get_size()
+            os.makedirs(os.path.dirname(prepared), exist_ok=True)
+            pygame.image.save(image if image.get_size() == size else pygame.transform.smoothscale(image, size),
+                              prepared)
+            saved += 1
+
+    return saved, skipped
+
+
+def save_sizes():
+    # Original sizes, so the station doesn't need to decode icons just to calculate their scaled size
+    index = utils.read_json_file(utils.resource_path(wconstants.ASSETS_INDEX_FILE)) or {}
+    root = utils.resource_path(".")
+    for path, size in _originals.items():
+        index[os.path.relpath(path, root)] = size
+    utils.write_json_file(utils.resource_path(wconstants.ASSETS_INDEX_FILE), index)
+
+
+def bundle_files(sizes):
+    # Original images and all prepared files (of any resolution)
+    files = sorted(sizes)
+    for root, folders, names in os.walk(utils.resource_path(wconstants.ASSETS_FOLDER)):
+        files += sorted(os.path.join(root, name) for name in names if name.endswith(".png"))
+    return files
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prepare icons and backgrounds of Weather & News for a resolution")
+    parser.add_argument("--size", default="%dx%d" % settings.dispSize,
+                        help="screen resolution as WIDTHxHEIGHT (default: resolution in settings)")
+    parser.add_argument("--force", action="store_true", help="prepare all files again, even if up to date")
+    parser.add_argument("--bundle", action="store_true",
+                        help="pack resources and prepared files into %s" % wconstants.BUNDLE_FILE)
+    options = parser.parse_args()
+
+    size = tuple(int(value) for value in options.size.lower().split("x"))
+    print("Preparing assets for %dx%d into %s" % (size + (utils.resource_path(wconstants.ASSETS_FOLDER),)))
+    sizes = icon_sizes(size)
+    saved, skipped = prepare(sizes, options.force)
+    save_sizes()
+    print("%d images: %d files saved, %d already up to date" % (len(sizes), saved, skipped))
+
+    if options.bundle:
+        files = bundle_files(sizes)
+        packed = wbundle.build(utils.resource_path(wconstants.BUNDLE_FILE), files)
+        print("%d files (%d KB) packed into %s" % (len(files), packed // 1024, utils.resource_path(wconstants.BUNDLE_FILE)))
+
+
+if __name__ == "__main__":
+    main()
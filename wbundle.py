@@ -0,0 +1,127 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import io
+import json
+import mmap
+import os
+import struct
+import threading
+import traceback
+import utils
+import wconstants
+
+# Packed assets: many small files (icons, backgrounds, prepared variants) in a single file, read through mmap
+# Opening one file instead of hundreds is much faster on slow SD cards. Layout:
+#   MAGIC | index length (8 bytes, little endian) | index (JSON: {relative path: [offset, length, mtime]}) | files data
+# Offsets are relative to the start of files data. Length and mtime are those of the file when bundled.
+# Paths are relative to the program folder, with "/" separators. Build it with: python wassets.py --bundle
+# Files changed since bundled (different size or modification time) are read from disk instead, until rebuilt.
+# That is checked once, when the bundle is opened (files only in bundle are fine). Lookups just use the index then.
+
+MAGIC = b"WSBUNDLE1\n"
+
+_lock = threading.Lock()
+_bundle = None
+
+
+def _key(path):
+    return os.path.relpath(path, utils.resource_path(".")).replace(os.sep, "/")
+
+
+class Bundle(object):
+    """Read-only access to a bundle file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.index = {}
+        self.data = None
+        self.start = 0
+        try:
+            with open(path, "rb") as file:
+                self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            if self.data[:len(MAGIC)] != MAGIC:
+                raise ValueError("Not a bundle file")
+            start = len(MAGIC) + 8
+            (length,) = struct.unpack("<Q", self.data[len(MAGIC):start])
+            self.index = json.loads(self.data[start:start + length].decode("utf-8"))
+            self.start = start + length
+            self._validate()
+        except:
+            print("Error opening assets bundle", path)
+            print(traceback.format_exc())
+            self.index = {}
+
+    def _validate(self):
+        # Forget files changed since bundled, so they are read from disk
+        root = utils.resource_path(".")
+        changed = 0
+        for key, entry in list(self.index.items()):
+            try:
+                stat = os.stat(os.path.join(root, key))
+            except OSError:
+                # Only in bundle
+                stat = None
+            if len(entry) < 3 or (stat is not None and (stat.st_size != entry[1] or stat.st_mtime != entry[2])):
+                del self.index[key]
+                changed += 1
+        if changed:
+            print(changed, "files changed since bundled. Run 'python wassets.py --bundle' to update", self.path)
+
+    def _entry(self, path):
+        # Index entry of path, or None if not in bundle or if its file changed since bundled
+        return self.index.get(_key(path))
+
+    def __contains__(self, path):
+        return self._entry(path) is not None
+
+    def mtime(self, path):
+        # Modification time of the file when bundled, or None if not in bundle (or changed since)
+        entry = self._entry(path)
+        return entry[2] if entry is not None else None
+
+    def read(self, path):
+        # File contents as a file-like object, or None if not in bundle (or changed since)
+        entry = self._entry(path)
+        if entry is None:
+            return None
+        offset = self.start + entry[0]
+        return io.BytesIO(self.data[offset:offset + entry[1]])
+
+
+def get_bundle():
+    # Bundle in wconstants.BUNDLE_FILE (opened once), or None if there is no bundle
+    global _bundle
+    with _lock:
+        if _bundle is None:
+            path = utils.resource_path(wconstants.BUNDLE_FILE)
+            _bundle = Bundle(path) if os.path.isfile(path) else False
+    return _bundle or None
+
+
+def read(path):
+    bundle = get_bundle()
+    return bundle.read(path) if bundle is not None else None
+
+
+def build(path, files):
+    # Pack files (paths) into a new bundle in path. Returns number of bytes of packed files
+    index = {}
+    offset = 0
+    for name in files:
+        stat = os.stat(name)
+        index[_key(name)] = [offset, stat.st_size, stat.st_mtime]
+        offset += stat.st_size
+
+    header = json.dumps(index).encode("utf-8")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "wb") as bundle:
+        bundle.write(MAGIC)
+        bundle.write(struct.pack("<Q", len(header)))
+        bundle.write(header)
+        for name in files:
+            with open(name, "rb") as file:
+                bundle.write(file.read())
+    os.replace(path + ".tmp", path)
+
+    return offset
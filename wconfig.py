@@ -167,7 +167,8 @@ class WeatherConfig:
         label = tk.Label(tab, text="Your IP location (might not be accurate): ")
         label.grid(row=6, column=0, columnspan=5, sticky=tk.NW, padx=self.padx, pady=self.pady)
 
-        cLocation = utils.get_location_by_ip(wconstants.gIPURL % self.config["General"]["Language"])
+        cLocation = utils.get_location_by_ip(wconstants.gIPURL % self.config["General"]["Language"],
+                                             timeout=wconstants.httpTimeouts[wconstants.HTTP_GEOIP])
         if cLocation:
             currloc = (cLocation[0] + (", " + cLocation[1] if cLocation[1] else "") +
                        (", " + cLocation[2] if cLocation[2] else ""))
@@ -859,7 +860,7 @@ class WeatherConfig:
     def search(self, tab):
 
         q = urllib.parse.quote(self.city.get() + ("," + self.prov.get() if self.prov.get() else "") + ("," + self.country.get() if self.country.get() else ""))
-        coord = utils.get_coordinates(wconstants.gURL % q)
+        coord = utils.get_coordinates(wconstants.gURL % q, timeout=wconstants.httpTimeouts[wconstants.HTTP_SEARCH])
 
         if coord:
             text = "Search results (copy-paste latitude and longitude to change stored settings location)"
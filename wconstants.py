@@ -1,6 +1,7 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
+import os
 import wkey
 
 ### CONSTANTS
@@ -72,10 +73,20 @@ MOON_W_FOLDER = ICON_FOLDER + ICONSET_REALISTIC
 SUNSIGNS_FOLDER = 'resources/sunsigns/'
 FONTS_FOLDER = 'resources/fonts/'
 ALERT_ICONFOLDER = 'resources/'
+CACHE_FOLDER = 'cache/'
+RECORDINGS_FOLDER = 'recordings/'
+IMAGE_CACHE_FOLDER = CACHE_FOLDER + 'images/'
+BKG_CACHE_FOLDER = CACHE_FOLDER + 'wbkg/'
+ASSETS_FOLDER = CACHE_FOLDER + 'assets/'        # Icons and backgrounds prepared for a resolution (wassets.py)
+ASSETS_INDEX_FILE = ASSETS_FOLDER + 'sizes.json'
+BUNDLE_FILE = CACHE_FOLDER + 'assets.bundle'         # Resources and prepared assets packed in one file (wbundle.py)
 
 # Other
 SETTINGS_FILE = "settings.json"
 DEFAULT_SETTINGS_FILE = "resources/defsett.json"
+WEATHER_CACHE_FILE = CACHE_FOLDER + "weather.json"
+LOCATION_CACHE_FILE = CACHE_FOLDER + "location.json"
+CALLS_LEDGER_FILE = CACHE_FOLDER + "calls.json"
 HELP_FILE = "resources/help.json"
 ALERT_ICON = "alert"
 SYSTEM_CAPTION = "Weather & News by alef"
@@ -146,9 +157,15 @@ newsTh = Th             # News font size. Warning: text rendering may fail with
 # Be aware you will be banned if you overpass the API query limits (e.g. 1 query per minute  =  14.400 queries per day!)
 # Note that other providers may (will) have slight differences in their APIs
 NSUB = 4                            # Number of daily forecasts shown (including current day)
+timeLabelsCache = 256               # Formatted forecast times kept (daily + hourly of several locations)
 min_update_weather = 2             # Minute multiple in which update weather
 sec_update_weather = 5              # Second in which update weather
-errMax = 8                          # Around 2 hours without a correct weather update (will fall back to world_clocks)
+sec_prerender_clock = 50            # Second from which next minute clock is composed in advance (off-screen)
+weatherObsolete = 2 * 60 * 60       # Seconds without a correct weather update before falling back to world_clocks
+min_prefetch_weather = 15           # Minutes after which weather of other (not shown) locations is updated
+sec_prefetch_stagger = 20           # Seconds between two updates of other locations (not to request them all at once)
+prefetchWorkers = 3                 # Maximum number of locations being updated at the same time
+sec_save_weather = 15 * 60          # Minimum seconds between two writes of weather info to disk (not to wear SD cards)
 weatherURL = 'https://api.openweathermap.org/data/2.5/onecall?%s&units=%s&lang=%s&exclude=minutely&appid=' + wkey.openweathermap_key
 hourly_number = 19                  # Number of hourly forecasts shown
 # degree_sign = u'\N{DEGREE SIGN}'    # Unicode for Degree symbol (https://www.ssewconstants.wiswconstants.edu/~tomw/java/unicode.html)
@@ -194,10 +211,76 @@ currentTZSep = "@"                  # Character to identify and show current Tim
 gIPURL = 'http://ip-api.com/json/?lang=%s'     # NO Key required, but not precise (good enough for Time Zone, not for location)
 # gURL = 'https://api.ipgeolocation.io/ipgeo?apiKey=%s'  # Or use this instead (more precise, but needs key)
 gURL = 'http://nominatim.openstreetmap.org/search?q=%s&format=json&addressdetails=1'  # No key required. Retrieves coordinates from address
+geoCacheTTL = 6 * 60 * 60           # Seconds IP location is reused before refreshing it (in background)
 
 # HTTP Connection
-# Definitely, requests.get was caching... Maybe "Connection: keep-alive" which seems to be set by default!
+# Definitely, requests.get was caching... Connections are now kept alive (pooled), so "no cache" is granted
+# by these headers plus a cache-busting query parameter on the endpoints listed in httpNoCache
 headers = {'Cache-Control': 'no-cache, no-store, max-age=0, pre-check=0, post-check=0, must-revalidate, proxy-revalidate',
            'Pragma': 'no-cache',
-           'Connection': 'close',
-           'Keep-Alive': 'false'}
+           'Accept-Encoding': 'gzip',
+           'User-Agent': 'WeatherStationPG'}
+HTTP_WEATHER = "weather"
+HTTP_NEWS = "news"
+HTTP_PICS = "pics"
+HTTP_GEOIP = "geoip"
+HTTP_SEARCH = "search"
+httpTimeout = 20                    # Default timeout (seconds)
+httpTimeouts = {HTTP_WEATHER: 20,
+                HTTP_NEWS: 15,
+                HTTP_PICS: 10,
+                HTTP_GEOIP: 5,
+                HTTP_SEARCH: 10}
+httpNoCache = (HTTP_WEATHER, HTTP_NEWS)
+dnsTTL = 5 * 60                     # Seconds DNS results are cached
+
+# Retry policies (per endpoint). Delays in seconds: retries wait base * 2^failures (up to maxDelay), plus jitter.
+# After threshold consecutive failures, endpoint is considered down (circuit open) and not called for openTime.
+# If hedge, a second request is fired when the first is slower than hedgePercentile of recent requests
+# Only for news: weather requests are API calls counted against the budget (see callBudgets), and geoip is called
+# too few times to know its latency
+retryPolicies = {HTTP_WEATHER: {"base": 30, "maxDelay": 15 * 60, "threshold": 5, "openTime": 20 * 60, "hedge": False},
+                 HTTP_NEWS: {"base": 60, "maxDelay": 15 * 60, "threshold": 3, "openTime": 30 * 60, "hedge": True},
+                 HTTP_GEOIP: {"base": 60, "maxDelay": 60 * 60, "threshold": 3, "openTime": 2 * 60 * 60, "hedge": False}}
+hedgePercentile = 0.9
+hedgeSamples = 20                   # Recent requests used to calculate the percentile (hedging starts with half of them)
+
+# Image cache (news pics). Keep size low enough for the SD card: scaled variants are stored as raw pixels
+imageCacheSize = 40 * 1024 * 1024   # Bytes. Least recently used pictures are deleted beyond this size
+imageCacheFresh = 6 * 60 * 60       # Seconds a cached picture is used without revalidating it (ETag / Last-Modified)
+imageIndexSave = 30 * 60            # Minimum seconds between two writes of the cache index, if only used times changed
+
+# Rendered texts cache (most labels are the same from one redraw to the next)
+textCacheSize = 8 * 1024 * 1024     # Bytes. Least recently used texts are discarded beyond this size
+textSizeCache = 1024                # Text sizes (measured, not rendered) kept
+atlasCacheSize = 16 * 1024 * 1024   # Bytes. Clock digits atlases (one per font, colors and outline style)
+iconCacheSize = 6 * 1024 * 1024     # Bytes of decoded and scaled icons kept (least recently used are discarded)
+
+# Backgrounds cache: already scaled and dimmed, in memory and as raw pixels on disk (BKG_CACHE_FOLDER)
+bkgCacheSize = 16 * 1024 * 1024     # Bytes of backgrounds kept in memory (least recently used are discarded)
+bkgDiskCacheSize = 96 * 1024 * 1024 # Bytes. Oldest backgrounds are deleted from disk beyond this size
+
+# API call budgets (per key), persisted in CALLS_LEDGER_FILE. Days start at 00:00 UTC (as in OpenWeatherMap)
+# If several stations share the same key, set stations accordingly: each one will use its part of the budget.
+# Refresh intervals are stretched when the calls wanted for the rest of the day don't fit in the remaining budget
+callBudgets = {HTTP_WEATHER: {"daily": 1000, "perMinute": 60, "stations": 1}}
+
+# Record / Replay (offline testing and benchmarking, no API quota used)
+# "record": save every raw response (and its timing) into RECORDINGS_FOLDER while running normally
+# "replay": serve saved responses instead of accessing the Internet, simulating latency, errors and timeouts
+# To use the local stand-in server instead (run wreplay.py), set standInURL: all source URLs will point to it
+HTTP_LIVE = "live"
+HTTP_RECORD = "record"
+HTTP_REPLAY = "replay"
+httpMode = os.getenv("WTHRNEWS_HTTP_MODE", HTTP_LIVE)
+replayLatency = None                # Seconds. Set to None to use the recorded response times
+replayErrorRate = 0.0               # Ratio (0.0 - 1.0) of replayed requests failing with an HTTP error
+replayTimeoutRate = 0.0             # Ratio (0.0 - 1.0) of replayed requests failing with a timeout
+replaySeed = 0                      # Same seed, same sequence of failures (set to None for a random one)
+standInURL = os.getenv("WTHRNEWS_STANDIN", "")     # e.g. "http://127.0.0.1:8765/"
+if standInURL:
+    weatherURL = standInURL + weatherURL.split("://", 1)[1]
+    nURL1 = standInURL + nURL1.split("://", 1)[1]
+    nURL2 = standInURL + nURL2.split("://", 1)[1]
+    gIPURL = standInURL + gIPURL.split("://", 1)[1]
+    gURL = standInURL + gURL.split("://", 1)[1]
@@ -0,0 +1,74 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import wconstants
+
+# Sizes icons are drawn at, for a given screen size. Shared by the station and the assets preparation tool
+# (wassets.py), so prepared icons match exactly what the layout asks for. Sizes are (width, height) in pixels;
+# original sizes are those of the icon files
+
+
+def icon_scales(ymax, iconSet):
+    # Base sizes: current conditions, forecasts, moon, sun sign and alert icons
+    iconScale = wconstants.ICON_SCALE.get(iconSet, 1.0)
+    return (int(ymax * wconstants.iconSizeC / wconstants.REF_Y * iconScale),
+            int(ymax * wconstants.iconSizeF / wconstants.REF_Y * iconScale),
+            int(ymax * wconstants.moonIconSize / wconstants.REF_Y),
+            int(ymax * wconstants.sunsignIconSize / wconstants.REF_Y),
+            int(ymax * wconstants.alertIconSize / wconstants.REF_Y))
+
+
+def margins(xmax, ymax):
+    # Margins and gaps between elements: xmargin, ymargin, xgap, ygap
+    xmargin = xmax * 0.01
+    ymargin = ymax * 0.01
+    return xmargin, ymargin, xmargin * 3, ymargin * 3
+
+
+def hourly_width(xmax):
+    xgap = margins(xmax, 0)[2]
+    return (xmax - xgap) / wconstants.hourly_number
+
+
+def current_icon_size(size, scale):
+    ix, iy = size
+    if ix != iy:
+        # These icons are wider than taller and need a different scale and additional space
+        return int(scale), int(iy * (scale / ix))
+    return int(scale), int(scale)
+
+
+def moon_w_icon_size(size, scaleC):
+    ix, iy = size
+    return int(scaleC * 0.7), int((iy * (scaleC / ix)) * 0.7)
+
+
+def daily_icon_size(size, scaleF):
+    ix, iy = size
+    if ix != iy:
+        # These icons are wider than longer and need a different scale
+        return int(scaleF * 1.15), int(iy * ((scaleF * 1.15) / ix))
+    return scaleF, int(iy * (scaleF / ix))
+
+
+def hourly_icon_size(size, subwinWidth, iconSet):
+    ix, iy = size
+    subScale = 1.1
+    if ix != iy:
+        subScale = 1.0
+    scaleX = int(subwinWidth * subScale * wconstants.ICON_SCALE.get(iconSet, 1.0))
+    return scaleX, int(scaleX * (iy / ix))
+
+
+def sunsign_icon_size(size, sunsignScale):
+    sx, sy = size
+    return int(sx * (sunsignScale / sy)), sunsignScale
+
+
+def header_moon_size(sunsignScale):
+    scale = int(sunsignScale * 0.5)
+    return scale, scale
+
+
+def alert_icon_size(alertScale):
+    return alertScale, alertScale
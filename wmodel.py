@@ -0,0 +1,122 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import functools
+import locale
+import time
+import wutils
+import wconstants
+
+# Weather information as read-only snapshots with numeric values (formatting is done when drawing)
+# A new snapshot is created on every update and replaces the previous one in a single assignment,
+# so it can be safely handed between threads, cached and compared.
+
+
+@functools.lru_cache(maxsize=wconstants.timeLabelsCache)
+def _time_label(ts, tzOffset, fmt, loc):
+    return time.strftime(fmt, time.gmtime(ts + tzOffset))
+
+
+def time_label(ts, tzOffset, fmt="%H:%M"):
+    # Memoized: consecutive updates share most of their timestamps. Locale is part of the key (day names)
+    return _time_label(ts, tzOffset, fmt, locale.setlocale(locale.LC_TIME))
+
+
+class _Frozen:
+    __slots__ = ()
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            object.__setattr__(self, name, values.get(name))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("%s is read-only" % type(self).__name__)
+
+    def __delattr__(self, name):
+        raise AttributeError("%s is read-only" % type(self).__name__)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.values() == other.values()
+
+    def __hash__(self):
+        return hash(self.values())
+
+    def __repr__(self):
+        return "%s(%s)" % (type(self).__name__, ", ".join("%s=%r" % (n, getattr(self, n)) for n in self.__slots__))
+
+    def values(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+
+class DailyForecast(_Frozen):
+    __slots__ = ("dt", "icon", "pop", "tempMax", "tempMin")
+
+
+class HourlyForecast(_Frozen):
+    __slots__ = ("dt", "temp", "icon")
+
+
+class WeatherSnapshot(_Frozen):
+    """ Current conditions and forecasts of one location. Temperatures, wind and pressure in display units """
+
+    __slots__ = ("fetchTime", "tzOffset", "dt", "temp", "feelsLike", "code", "iconCode", "description", "windSpeed",
+                 "windDeg", "pressure", "humidity", "uvi", "moonPhase", "sunrise", "sunset", "alert", "alertStart",
+                 "alertEnd", "dayWindSpeed", "dayUvi", "daily", "hourly")
+
+    @classmethod
+    def from_onecall(cls, w, units, fetchTime=0):
+        # Parse OpenWeatherMap One Call response
+        cc = w["current"]
+        ff = w["daily"][0]
+        tzOffset = int(w["timezone_offset"])
+        windScale = wconstants.windScale[units]
+
+        alert = alertStart = alertEnd = None
+        if "alerts" in w.keys() and w["alerts"][0]["end"] > cc["dt"]:
+            alert = w["alerts"][0]["event"]
+            alertStart = w["alerts"][0]["start"]
+            alertEnd = w["alerts"][0]["end"]
+
+        # Daily forecasts, from current day on
+        daily = []
+        current = int(time.strftime("%y%m%d"))
+        for day_data in w["daily"][:8]:
+            if len(daily) >= wconstants.NSUB:
+                break
+            if int(time_label(day_data["dt"], 0, "%y%m%d")) >= current:
+                daily.append(DailyForecast(dt=day_data["dt"],
+                                           icon=wutils.convert_weather_code(str(day_data["weather"][0]["id"])),
+                                           pop=int(round(day_data["pop"] * 100 / 5, 0)) * 5,
+                                           tempMax=day_data["temp"]["max"], tempMin=day_data["temp"]["min"]))
+
+        # Hourly forecasts, from next hour on
+        hourly = []
+        for hour_data in w["hourly"][:48]:
+            if len(hourly) >= wconstants.hourly_number:
+                break
+            if hour_data["dt"] > cc["dt"]:
+                icon = wutils.owm_icon(hour_data["weather"][0]["id"], str(hour_data["weather"][0]["icon"])[-1:] == "n")
+                hourly.append(HourlyForecast(dt=hour_data["dt"], temp=hour_data["temp"], icon=icon))
+
+        return cls(fetchTime=fetchTime, tzOffset=tzOffset, dt=cc["dt"], temp=cc["temp"], feelsLike=cc["feels_like"],
+                   code=wutils.convert_weather_code(str(cc["weather"][0]["id"])),
+                   iconCode=str(cc["weather"][0]["icon"]),
+                   description=str(cc["weather"][0]["description"]).capitalize(),
+                   windSpeed=cc["wind_speed"] * windScale, windDeg=cc["wind_deg"],
+                   pressure=cc["pressure"] * wconstants.baroScale[units], humidity=cc["humidity"], uvi=cc["uvi"],
+                   moonPhase=ff["moon_phase"], sunrise=cc["sunrise"], sunset=cc["sunset"],
+                   alert=alert, alertStart=alertStart, alertEnd=alertEnd,
+                   dayWindSpeed=ff["wind_speed"] * windScale, dayUvi=ff["uvi"],
+                   daily=tuple(daily), hourly=tuple(hourly))
+
+    def local_time(self, ts, fmt="%H:%M"):
+        # Time at weather location
+        return time_label(ts, self.tzOffset, fmt)
+
+    def moon(self):
+        return wutils.convert_moon_phase(self.moonPhase)
+
+    def conditions(self):
+        # What is shown as current conditions (to detect if weather info actually changed)
+        return (int(self.temp), int(self.feelsLike), self.code, self.description, round(self.windSpeed),
+                self.windDeg, round(self.pressure, 2), self.humidity)
@@ -0,0 +1,128 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Local stand-in server for OpenWeatherMap, RTVE, BBC and ip-api (and any other recorded source)
+# It serves the responses saved while running in "record" mode (see wconstants), with configurable latency,
+# errors and timeouts, so fetching and parsing can be tested and benchmarked offline, without using API quota.
+#
+# 1. Record:  WTHRNEWS_HTTP_MODE=record python wthrnews.py
+# 2. Serve:   python wreplay.py --port 8765 --latency 0.3 --errors 0.1
+# 3. Run:     WTHRNEWS_STANDIN=http://127.0.0.1:8765/ python wthrnews.py
+
+import argparse
+import glob
+import gzip
+import json
+import os
+import random
+import time
+import urllib.parse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import netutils
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    options = None
+    rand = None
+    hosts = []
+
+    def log_message(self, format, *args):
+        if self.options.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        # Request path is the original URL without scheme: /api.openweathermap.org/data/2.5/onecall?...
+        key = netutils.recording_key("http:/" + self.path)
+        meta, body = netutils.load_recording(key, self.options.folder)
+
+        fault = netutils.replay_fault(self.options.errors, self.options.timeouts, self.rand)
+        if fault == "timeout":
+            time.sleep(self.options.hang)
+            self.close_connection = True
+            return
+
+        if meta is None:
+            print("Not recorded:", key)
+            self.reply(404, {"Content-Type": "text/plain"}, b"Not recorded")
+            return
+
+        latency = self.options.latency
+        if latency is None:
+            latency = meta.get("elapsed", 0)
+        time.sleep(latency)
+
+        if fault == "error":
+            self.reply(503, {"Content-Type": "text/plain"}, b"Replayed error")
+        else:
+            self.reply(meta["status"], meta.get("headers", {}), self.rewrite(body, meta.get("headers", {})))
+
+    def rewrite(self, body, headers):
+        # Make URLs inside responses (e.g. news pics) point to this server too
+        contentType = ""
+        for key, value in headers.items():
+            if key.lower() == "content-type":
+                contentType = value.lower()
+        if not any(t in contentType for t in ("xml", "json", "text", "html")):
+            return body
+
+        base = ("http://%s/" % self.headers.get("Host", "%s:%d" % self.server.server_address)).encode()
+        for host in self.hosts:
+            for scheme in (b"http://", b"https://"):
+                body = body.replace(scheme + host.encode() + b"/", base + host.encode() + b"/")
+
+        return body
+
+    def reply(self, status, headers, body):
+        if "gzip" in self.headers.get("Accept-Encoding", "") and len(body) > 512:
+            body = gzip.compress(body)
+            headers = dict(headers, **{"Content-Encoding": "gzip"})
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def recorded_hosts(folder):
+    hosts = set()
+    for name in glob.glob(os.path.join(folder, "*.json")):
+        try:
+            with open(name, encoding='UTF-8') as file:
+                hosts.add(urllib.parse.urlsplit("http://" + json.load(file)["key"]).netloc)
+        except:
+            print("Invalid recording:", name)
+
+    return sorted(hosts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve recorded responses for Weather & News")
+    parser.add_argument("--folder", default=netutils.recordings_folder, help="folder with recordings")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=None,
+                        help="seconds to wait before replying (default: recorded response time)")
+    parser.add_argument("--errors", type=float, default=0.0, help="ratio of requests replied with HTTP 503")
+    parser.add_argument("--timeouts", type=float, default=0.0, help="ratio of requests never replied")
+    parser.add_argument("--hang", type=float, default=60.0, help="seconds to stall a timed out request")
+    parser.add_argument("--seed", type=int, default=0, help="same seed, same sequence of failures")
+    parser.add_argument("--verbose", action="store_true")
+    options = parser.parse_args()
+
+    ReplayHandler.options = options
+    ReplayHandler.rand = random.Random(options.seed)
+    ReplayHandler.hosts = recorded_hosts(options.folder)
+    print("Recorded hosts:", ", ".join(ReplayHandler.hosts) or "None (check folder)")
+
+    server = ThreadingHTTPServer((options.host, options.port), ReplayHandler)
+    print("Serving recordings from %s on http://%s:%d/" % (options.folder, options.host, options.port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
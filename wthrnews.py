@@ -4,14 +4,14 @@
 import importlib
 import sys
 import threading
+import concurrent.futures
+import functools
 import pygame
 import pygame_menu
 from typing import Tuple, Any
 import time
 import locale
-import urllib.request
 import json
-import xml.etree.ElementTree as ET
 import traceback
 import settings
 import wconstants
@@ -19,6 +19,10 @@ import wconfig
 import pgutils
 import wutils
 import utils
+import netutils
+import wmodel
+import wlayout
+import wkey
 import zoneinfo
 
 # WORK PENDING: use gettext instead of current translation method (not referred to locale)
@@ -44,10 +48,7 @@ class MyWeatherStation:
                                                              icon=wconstants.SYSTEM_ICON,
                                                              caption=wconstants.SYSTEM_CAPTION)
         self.xmin = self.ymin = 0
-        self.xmargin = self.xmax * 0.01
-        self.ymargin = self.ymax * 0.01
-        self.xgap = self.xmargin * 3
-        self.ygap = self.ymargin * 3
+        self.xmargin, self.ymargin, self.xgap, self.ygap = wlayout.margins(self.xmax, self.ymax)
 
         # Set system locale according to the language selected on settings. If not possible, it will fallback to default
         # Use 'sudo dpkg-reconfigure locales' to install/set locales (or system preferences on non-Linux OS)
@@ -71,8 +72,13 @@ class MyWeatherStation:
         self.nsource = wconstants.nsource1
         self.nURL = wconstants.nURL1
         self.dist_limit = 0
+        self.geoFetcher = None
+        self.geoloc = utils.read_json_file(utils.resource_path(wconstants.LOCATION_CACHE_FILE))
         if settings.use_current_location and not settings.clockMode:
-            self.dist_limit = self.check_location()
+            self.dist_limit = self.check_location(wait=True)
+        elif not settings.clockMode:
+            # Get location ready in background for when it is needed (e.g. Quick Options menu)
+            self.get_location()
         self.location = settings.location[0][0]
         self.zip_code = settings.location[0][1]
         self.crc = settings.clockc
@@ -80,11 +86,10 @@ class MyWeatherStation:
 
         # Settings
         self.iconf = wconstants.ICON_FOLDER + settings.iconSet
-        self.iconScaleC = int(self.ymax * wconstants.iconSizeC / wconstants.REF_Y * wconstants.ICON_SCALE.get(settings.iconSet, 1.0))
-        self.iconScaleF = int(self.ymax * wconstants.iconSizeF / wconstants.REF_Y * wconstants.ICON_SCALE.get(settings.iconSet, 1.0))
-        self.moonIconScale = int(self.ymax * wconstants.moonIconSize / wconstants.REF_Y)
-        self.sunsignIconScale = int(self.ymax * wconstants.sunsignIconSize / wconstants.REF_Y)
-        self.alertIconScale = int(self.ymax * wconstants.alertIconSize / wconstants.REF_Y)
+        pgutils.index_icons([self.iconf, wconstants.MOON_FOLDER, wconstants.MOON_W_FOLDER, wconstants.SUNSIGNS_FOLDER,
+                             wconstants.ALERT_ICONFOLDER])
+        self.iconScaleC, self.iconScaleF, self.moonIconScale, self.sunsignIconScale, self.alertIconScale = \
+            wlayout.icon_scales(self.ymax, settings.iconSet)
 
         # Other variables
         self.counter = 0
@@ -104,89 +109,58 @@ class MyWeatherStation:
         self.onlyTime = False
         self.onlyTimePrev = None
         self.user_clockMode = False
-        self.errCount = 0
+        self.weatherPolicy = netutils.policy(wconstants.HTTP_WEATHER)
+        self.prefetchPolicy = netutils.policy(wconstants.HTTP_WEATHER, "prefetch")
+        self.owmBudget = netutils.budget(wconstants.HTTP_WEATHER, wkey.openweathermap_key, "OWM")
+        self.wRequestTime = 0
+        self.wFetchers = {}
+        self.wFetched = {}
+        self.wFetchLock = threading.Lock()
+        self.wFetchTime = 0
+        self.wForce = False
+        self.wCache = {}
+        self.wCacheLock = threading.Lock()
+        self.wSaver = utils.JsonSaver(utils.resource_path(wconstants.WEATHER_CACHE_FILE), wconstants.sec_save_weather)
+        self.wPrefetching = set()
+        self.wPrefetchTime = 0
+        self.wPool = concurrent.futures.ThreadPoolExecutor(max_workers=wconstants.prefetchWorkers)
         self.sepPos = 0
         self.titles = ''
-        self.pics = [None, None, None, None, None]
+        self.pics = [None] * wconstants.newsNumber
+        self.picsCycle = 0
+        self.picsPool = concurrent.futures.ThreadPoolExecutor(max_workers=wconstants.newsNumber)
         self.tzOffset = None
         self.WtzOffset = 0
         self.nightTime = False
         self.xMoon = 0
-        self.sunsign = None
-        self.sunsign_icon = None
-        self.moonHIcon = None
         self.rectHeader = None
-        self.imgHeader = None
         self.rectTime = None
-        self.imgTime = None
         self.rectCC = None
-        self.imgCC = None
         self.rectFF = None
-        self.imgFF = None
         self.rectAlert = None
-        self.imgAlert = None
+        self.wRegions = {}
+        self.dailyRects = []
 
         # Weather info initialization
         self.wcc = ''
         self.wff = ''
         self.bkgCode = wconstants.DEFAULT_BKG
         self.iconNow = wconstants.DEFAULT_ICON
-        self.iconNowPrev = None
-        self.iconImgC = None
         self.bkgCodePrev = None
         self.iconC2 = None
-        self.iconC2Prev = None
-        self.iconImgC2 = None
-        self.temp = ''
-        self.temptext = ''
-        self.feels_like = '0'
-        self.wind_speed = '0'
-        self.baro = '29.95'
-        self.wind_dir = 'S'
-        self.humid = '50.0'
-        self.uvi = ''
-        self.moon = None
-        self.prevMoon = None
-        self.moonPrev = None
-        self.moonIcon = None
-        self.alert_start = ""
-        self.alert_end = ""
-        self.alert = None
-        self.alertIcon = None
-        self.wLastUpdate = ''
-        self.wPrevUpdate = ''
+        self.weather = None
+        self.wPrevUpdate = None
         self.wLastForecastUpdate = ''
-        self.last = ''
-        self.day = []
-        for i in range(wconstants.NSUB): self.day.append('')
-        self.icon = []
-        for i in range(wconstants.NSUB): self.icon.append('na')
-        self.iconPrev = []
-        for i in range(wconstants.NSUB): self.iconPrev.append(None)
-        self.iconImg = []
-        for i in range(wconstants.NSUB): self.iconImg.append(None)
-        self.iconNight = []
-        for i in range(wconstants.NSUB): self.iconNight.append('')
-        self.rain = []
-        for i in range(wconstants.NSUB): self.rain.append('')
-        self.temps = []
-        for i in range(wconstants.NSUB): self.temps.append(['', ''])
-        self.hTemps = []
-        for i in range(wconstants.hourly_number): self.hTemps.append('')
-        self.hIcons = []
-        for i in range(wconstants.hourly_number): self.hIcons.append(None)
         self.hIconPrev = ''
-        self.hHours = []
-        for i in range(wconstants.hourly_number): self.hHours.append('')
-        self.sunrise = '07:00'
-        self.sr = '07'
-        self.sunset = '20:00'
-        self.sn = '20'
+
+        # Recover last good weather info, so it can be shown right away while updating
+        self.load_weather()
 
         # Colors
         self.convertPGColors()
 
-        # Font Objects according to Text Sizes
+        # Font Objects according to Text Sizes (texts rendered with previous ones, if any, are not needed anymore)
+        pgutils.clear_text_caches()
         self.byF = pgutils.load_font(wconstants.FONTS_FOLDER, wconstants.font, int(self.ymax * wconstants.byTh), 0)
         self.yearF = pgutils.load_font(wconstants.FONTS_FOLDER, wconstants.font, int(self.ymax * wconstants.yearTh), 0)
         self.wdayF = pgutils.load_font(wconstants.FONTS_FOLDER, wconstants.font, int(self.ymax * wconstants.wdayTh), 0)
@@ -221,13 +195,27 @@ class MyWeatherStation:
         self.CCYPos = self.ymax * wconstants.CCYPos
         self.radius = int(self.ymax * wconstants.radius)  # Radius of the world clocks
 
+        # Screen layers, in drawing order. Only changed ones (and what they overlap) are redrawn
+        self.layers = pgutils.Compositor(self.screen)
+        self.layers.add_layer("header", self.display_header)
+        self.layers.add_layer("time", self.display_time)
+        self.layers.add_layer("current", self.display_conditions, False)
+        self.layers.add_layer("alert", self.display_alert, False)
+        self.layers.add_layer("forecasts", self.display_forecasts, False)
+        self.layers.add_layer("clocks", self.show_world_clocks, False)
+        # Next minute clock (and header at midnight), composed in advance to be just swapped in at the right time
+        self.frame = None
+        self.frameTime = None
+        self.frameLabel = None
+        self.frameState = None
+
     def __del__(self):
         """ Destructor to make sure pygame shuts down, etc. """
 
-    def check_location(self):
-        if settings.debug: print("GET_LOC", time.strftime("%H:%M:%S"))
+    def check_location(self, wait=False):
+        if settings.debug: print("CHECK_LOC", time.strftime("%H:%M:%S"))
 
-        loc = utils.get_location_by_ip(wconstants.gIPURL % settings.lang)
+        loc = self.get_location(wait)
         if loc:
             loc1 = (float(loc[3]), float(loc[4]))
             loc2 = (float(settings.location[0][1].split("lat=")[1].split("&")[0]), float(settings.location[0][1].split("&lon=")[1]))
@@ -240,11 +228,57 @@ class MyWeatherStation:
                 for i in range(0, len(settings.location)):
                     locations.append(settings.location[i])
                 settings.location = locations
+        elif self.geoFetcher is not None and self.geoFetcher.is_alive():
+            # Still getting location. Keep previous value by now
+            dist = self.dist_limit
         else:
             dist = -1
 
         return dist
 
+    def get_location(self, wait=False):
+        # Location by IP is cached (also on disk) and refreshed in background once expired, so nothing waits for it.
+        # Set wait to get it right away if there is no location at all (e.g. first run)
+        cache = self.geoloc
+        expired = not cache or cache.get("lang") != settings.lang or \
+            time.time() - cache.get("time", 0) > wconstants.geoCacheTTL
+        if expired and (self.geoFetcher is None or not self.geoFetcher.is_alive()):
+            if wait and not cache:
+                self.fetch_location()
+            else:
+                self.geoFetcher = threading.Thread(target=self.fetch_location, daemon=True)
+                self.geoFetcher.start()
+
+        loc = []
+        if self.geoloc:
+            loc = self.geoloc.get("loc", [])
+
+        return loc
+
+    def fetch_location(self):
+        # May run in a separate thread. Result will be used next time location is checked
+        if settings.debug: print("GET_LOC", time.strftime("%H:%M:%S"))
+
+        policy = netutils.policy(wconstants.HTTP_GEOIP)
+        if not policy.ready():
+            return
+
+        start = time.time()
+        loc = utils.get_location_by_ip(wconstants.gIPURL % settings.lang,
+                                       timeout=wconstants.httpTimeouts[wconstants.HTTP_GEOIP])
+        if not loc:
+            policy.failure("No location")
+        else:
+            policy.success(time.time() - start)
+            self.geoloc = {"time": time.time(), "lang": settings.lang, "loc": loc}
+            try:
+                utils.write_json_file(utils.resource_path(wconstants.LOCATION_CACHE_FILE), self.geoloc)
+            except:
+                print("Error saving location")
+                print(traceback.format_exc())
+
+        return
+
     def convertPGColors(self):
         settings.cBkg = pygame.Color(settings.cBkg)
         settings.nBkg = pygame.Color(settings.nBkg)
@@ -297,6 +331,7 @@ class MyWeatherStation:
             if keep_location:
                 self.location = location
                 self.zip_code = zip_code
+                self.use_cached_weather()
             return rect
 
         elif self.showingMenu:
@@ -311,7 +346,8 @@ class MyWeatherStation:
         update_news = False
 
         # Get time
-        t = time.strftime("%H:%M:%S")
+        now = time.localtime()
+        t = time.strftime("%H:%M:%S", now)
         hours = int(t[:2])
         minutes = int(t[3:5])
         seconds = int(t[6:])
@@ -322,7 +358,8 @@ class MyWeatherStation:
             disp_time = True
             if minutes == 0 and hours == 0:
                 disp_header = True
-            elif self.sunset == hhmm or self.sunrise == hhmm:
+            elif self.weather is not None and \
+                    hhmm in (self.weather.local_time(self.weather.sunset), self.weather.local_time(self.weather.sunrise)):
                 displayAll = True
         else:
             disp_sep = True
@@ -336,11 +373,15 @@ class MyWeatherStation:
 
         if not settings.clockMode and not self.user_clockMode and \
             (updateWeather or
-             ((minutes + 1) % wconstants.min_update_weather == 0 and
+             ((self.weather_due() or self.weatherPolicy.failures) and
               (seconds == wconstants.sec_update_weather or displayAll or settings.newsMode == wconstants.NEWS_ALWAYSON))):
             disp_weather = True
             updateWeather = True
 
+        if not settings.clockMode and not self.user_clockMode and self.wFetched:
+            # Weather info fetched in background is ready to be shown
+            disp_weather = True
+
         if not settings.clockMode and not self.showingNews and \
                 (settings.newsMode == wconstants.NEWS_ALWAYSON or
                  (settings.newsMode == wconstants.NEWS_PERIOD and
@@ -354,16 +395,22 @@ class MyWeatherStation:
                   minutes % wconstants.min_update_news == 0 and seconds == wconstants.sec_show_news)):
             disp_news = True
 
-        # EXECUTE selected actions
-        if disp_sep and not disp_time:
-            rect.append(self.display_separator(seconds))
+        if not settings.clockMode and not self.user_clockMode:
+            self.prefetch_weather()
+        self.save_weather()
 
+        # EXECUTE selected actions
         if disp_weather:
+            self.wUpdated = False
+            fetched = bool(self.wFetched)
             if updateWeather:
                 self.wUpdated = self.update_weather(firstRun=displayAll)
+            if fetched:
+                self.wUpdated = self.apply_weather() or self.wUpdated
 
             if self.wUpdated:
-                if self.bkg != self.bkgCodePrev:
+                # Only a new background needs the whole screen. Otherwise, show_weather redraws what changed
+                if self.bkg_key() != self.bkgCodePrev:
                     displayAll = True
             elif self.onlyTime:
                 disp_weather = False
@@ -371,27 +418,42 @@ class MyWeatherStation:
                 if self.onlyTimePrev != self.onlyTime:
                     displayAll = True
                     self.onlyTimePrev = self.onlyTime
+            elif not fetched and not displayAll and not forceShowWeather:
+                # Weather is still being fetched in background. Nothing new to show yet
+                disp_weather = False
 
         if displayAll:
             self.display_bkg()
+            self.layers.invalidate()
             disp_header = True
             disp_time = True
 
-        if disp_header:
-            self.display_header()
-            rect.append(self.rectHeader)
-
+        if disp_time and not displayAll and self.frameLabel == hhmm and self.layers.pending is not None:
+            # Next minute was already prepared: just show it
+            self.rectHeader, self.rectTime, self.sepPos, self.xMoon = self.frameState
+            rect += self.layers.swap()
+        else:
+            if disp_header:
+                self.layers.invalidate("header")
+            if disp_time:
+                self.layers.invalidate("time")
         if disp_time:
-            self.display_time()
-            rect.append(self.rectTime)
+            self.frameLabel = None
 
         if disp_weather:
-            self.show_weather()
-            rect.append(self.rectCC)
-            rect.append(self.rectFF)
+            rect += self.show_weather(full=displayAll)
         elif disp_clocks:
-            self.show_world_clocks()
-            rect.append(self.rectFF)
+            for name in ("current", "alert", "forecasts"):
+                self.layers.show(name, False)
+            self.layers.show("clocks")
+            self.layers.invalidate("clocks")
+
+        rect += self.layers.compose()
+
+        if disp_sep and not disp_time:
+            rect.append(self.display_separator(seconds))
+            if seconds >= wconstants.sec_prerender_clock:
+                self.prerender_minute(now)
 
         if disp_news and (not self.showingNews or settings.newsMode == wconstants.NEWS_ALWAYSON):
             if displayAll and settings.newsMode == wconstants.NEWS_ALWAYSON:
@@ -409,49 +471,99 @@ class MyWeatherStation:
 
         return rect
 
+    def clock_time(self):
+        # Time to show (next minute, while it is being pre-rendered)
+        return time.localtime(self.frameTime) if self.frameTime is not None else time.localtime()
+
+    def prerender_minute(self, now):
+        # Use idle time to compose next minute's clock (and header, at midnight) off-screen, only once
+        nextMinute = (int(time.mktime(now)) // 60 + 1) * 60
+        label = time.strftime("%H:%M", time.localtime(nextMinute))
+        if self.frameLabel == label and self.layers.pending is not None:
+            return
+
+        names = ["time"]
+        if label == "00:00":
+            names.insert(0, "header")
+        if self.frame is None or self.frame.get_size() != self.screen.get_size():
+            self.frame = pgutils.to_display(pygame.Surface(self.screen.get_size()))
+
+        # Layers draw on self.screen: point it to frame meanwhile, keeping positions of what is being shown
+        screen = self.screen
+        state = self.rectHeader, self.rectTime, self.sepPos, self.xMoon
+        self.screen = self.frame
+        self.frameTime = nextMinute
+        try:
+            self.layers.prerender(names, self.frame)
+            self.frameState = self.rectHeader, self.rectTime, self.sepPos, self.xMoon
+            self.frameLabel = label
+        except:
+            print("Error pre-rendering next minute")
+            print(traceback.format_exc())
+        finally:
+            self.screen = screen
+            self.frameTime = None
+            self.rectHeader, self.rectTime, self.sepPos, self.xMoon = state
+
+    def bkg_key(self):
+        # Background to show: (code, dimmed forecasts). Code is None if plain color
+        weatherMode = not settings.clockMode and not self.user_clockMode and not self.onlyTime
+        dimForecasts = settings.dimForecasts and weatherMode
+        if not settings.showBkg:
+            return None, dimForecasts
+        if settings.bkgMode == wconstants.BKG_WEATHER and weatherMode:
+            code = str(self.bkgCode)
+        else:
+            code = str(wconstants.DEFAULT_BKG)
+        return code, dimForecasts
+
     def display_bkg(self):
         if settings.debug: print("DISP_BKG", time.strftime("%H:%M:%S"))
 
         rect = (self.xmin, self.ymin, self.xmax, self.ymax)
+        code, dimForecasts = self.bkg_key()
 
-        if settings.showBkg:
-            if settings.bkgMode == wconstants.BKG_WEATHER \
-                    and not settings.clockMode and not self.user_clockMode and not self.onlyTime:
-                code = str(self.bkgCode)
-            else:
-                code = str(wconstants.DEFAULT_BKG)
+        # Prepare Background layer only if changed since last time (dimmed areas are part of it)
+        if (code, dimForecasts) == self.bkgCodePrev:
+            return
+        self.bkgCodePrev = (code, dimForecasts)
 
-            # Prepare Background only if changed since last time
-            if code != self.bkgCodePrev:
-                self.bkgCodePrev = code
-                # Force capturing areas for new bkg
-                self.imgUpper = self.imgFF = self.imgTime = self.imgHeader = self.imgCC = self.imgAlert = None
+        if self.showingNews:
+            self.changedWhileNews = True
 
-                if self.showingNews:
-                    self.changedWhileNews = True
+        # Background (image or plain color), scaled and dimmed (cached, so switching backgrounds is fast)
+        dims = []
+        if code is not None and settings.dimBkg and code != str(wconstants.DEFAULT_BKG):
+            dims.append((rect, settings.dimFactor, settings.cdim))
+        if dimForecasts:
+            dims.append(((self.xmin + self.xmargin, self.subYPos, self.xmax - self.xmargin * 2,
+                          self.ymax - self.subYPos - self.ymargin), settings.dimFactor, settings.cdim))
+
+        self.bkg = None
+        if code is not None:
+            try:
+                self.bkg = pgutils.load_background(utils.resource_path(wconstants.BKG_FOLDER) + code + wconstants.BKG_EXT,
+                                                   (self.xmax, self.ymax), dims)
+                self.brightness = -1
+            except:
+                print("Error loading background. Loading default background instead. Code:", wconstants.BKG_FOLDER + code)
+                print(traceback.format_exc())
 
                 try:
-                    self.bkg = pygame.image.load(utils.resource_path(wconstants.BKG_FOLDER) + code + wconstants.BKG_EXT)
-                    self.brightness = -1
+                    self.bkg = pgutils.load_background(utils.resource_path(wconstants.BKG_FOLDER) + wconstants.NA_BKG + wconstants.BKG_EXT,
+                                                       (self.xmax, self.ymax), dims)
                 except:
-                    print("Error loading background. Loading default background instead. Code:", wconstants.BKG_FOLDER + code)
+                    print("Error loading default background (na.jpg). Display blank screen instead")
                     print(traceback.format_exc())
 
-                    try:
-                        self.bkg = pygame.image.load(utils.resource_path(wconstants.BKG_FOLDER) + wconstants.NA_BKG + wconstants.BKG_EXT)
-                    except:
-                        print("Error loading default background (na.jpg). Display blank screen instead")
-                        print(traceback.format_exc())
-                        pygame.draw.rect(self.screen, settings.cBkg, rect)
+        if self.bkg is None:
+            self.bkg = pygame.Surface((self.xmax, self.ymax))
+            self.bkg.fill(settings.cBkg)
+            for area, factor, color in dims:
+                pgutils.dim(self.bkg, factor, color, area, False)
+            self.bkg = pgutils.to_display(self.bkg)
 
-                if self.bkg.get_size() != (self.xmax, self.ymax):
-                    self.bkg = pygame.transform.smoothscale(self.bkg, (self.xmax, self.ymax))
-
-                self.screen.blit(self.bkg, rect)
-                if settings.dimBkg and code != str(wconstants.DEFAULT_BKG):
-                    pgutils.dim(self.screen, settings.dimFactor, settings.cdim, rect, False)
-        else:
-            pygame.draw.rect(self.screen, settings.cBkg, rect)
+        self.layers.set_background(self.bkg)
 
         return
 
@@ -460,12 +572,6 @@ class MyWeatherStation:
 
         self.rectHeader = (self.xmin, self.ymin, self.xmax, self.ygap * 5)
 
-        # Capture area background / Erase previous values
-        if settings.showBkg:
-            self.imgHeader = pgutils.prepare_area(self.screen, self.imgHeader, self.rectHeader)
-        else:
-            pygame.draw.rect(self.screen, settings.cBkg, self.rectHeader)
-
         self.display_calendar()
         self.display_by()
         self.display_location()
@@ -489,7 +595,7 @@ class MyWeatherStation:
     def display_calendar(self):
         if settings.debug: print("DISP_CALENDAR", time.strftime("%H:%M:%S"))
 
-        tm = time.strftime("%A/%B/%d/%Y/%m").split("/")
+        tm = time.strftime("%A/%B/%d/%Y/%m", self.clock_time()).split("/")
         dayofweek = tm[0]
         monthT = tm[1]
         dayT = tm[2]
@@ -528,41 +634,29 @@ class MyWeatherStation:
         x = self.xmax - self.xgap
 
         if settings.showSunSigns:
-            current_sunsign = wutils.get_constellation()
-
-            if self.sunsign != current_sunsign:
-                self.sunsign = current_sunsign
-                self.sunsign_icon = pgutils.load_icon(current_sunsign, wconstants.SUNSIGNS_FOLDER)
-                sx, sy = self.sunsign_icon.get_size()
-                self.sunsign_icon = pygame.transform.smoothscale(self.sunsign_icon,
-                                                                 (int(sx * (self.sunsignIconScale / sy)),
-                                                                  self.sunsignIconScale))
+            current_sunsign = wutils.get_constellation(self.clock_time())
+            size = pgutils.icon_size(current_sunsign, wconstants.SUNSIGNS_FOLDER)
+            sunsign_icon = pgutils.get_icon(current_sunsign, wconstants.SUNSIGNS_FOLDER,
+                                            wlayout.sunsign_icon_size(size, self.sunsignIconScale))
 
-            (sx, sy) = self.sunsign_icon.get_size()
+            (sx, sy) = sunsign_icon.get_size()
             x = self.xmax - sx - self.xmargin
-            self.screen.blit(self.sunsign_icon, (x, 0))
+            self.screen.blit(sunsign_icon, (x, 0))
 
         scale = int(self.sunsignIconScale * 0.5)
         self.xMoon = x - scale
         if not self.nightTime and settings.moonMode in (wconstants.MOON_BOTH, wconstants.MOON_ONHEADER) and \
-                not self.onlyTime and not settings.clockMode and not self.user_clockMode:
-            if not self.moonHIcon or self.moon != self.prevMoon:
-                self.prevMoon = self.moon
-                self.moonHIcon = pgutils.load_icon(self.moon, wconstants.MOON_FOLDER)
-                self.moonHIcon = pygame.transform.smoothscale(self.moonHIcon, (scale, scale))
-            self.screen.blit(self.moonHIcon, (self.xMoon, self.ygap))
+                self.weather is not None and not self.onlyTime and not settings.clockMode and not self.user_clockMode:
+            moonIcon = pgutils.get_icon(self.weather.moon(), wconstants.MOON_FOLDER,
+                                        wlayout.header_moon_size(self.sunsignIconScale))
+            self.screen.blit(moonIcon, (self.xMoon, self.ygap))
 
         return
 
     def display_separator(self, seconds):
         if settings.debug: print("DISP_SEP", time.strftime("%H:%M:%S"))
 
-        if seconds % 2 == 0:
-            sepColor = settings.clockc
-        else:
-            sepColor = settings.cdark
-
-        (txsep, tysep) = pgutils.draw_text(self.screen, ":", self.timeF, sepColor, True, self.sepPos, self.clockYPos)
+        (txsep, tysep) = self.clock_digits().draw(self.screen, ":", self.sepPos, self.clockYPos, dark=seconds % 2 != 0)
 
         return self.sepPos, self.clockYPos + tysep * 0.22, txsep, tysep - tysep * 0.4
 
@@ -570,43 +664,35 @@ class MyWeatherStation:
         if settings.debug: print("DISP_TIME", time.strftime("%H:%M:%S"))
 
         # Prepare values
-        tm = time.strftime("%H:%M")
+        tm = time.strftime("%H:%M", self.clock_time())
         hour = tm[:2]
         sep = tm[2:3]
         minute = tm[3:]
         x = self.xmargin
 
         # Prepare drawing
-        (tx2, ty2) = pgutils.draw_text(self.screen, hour, self.timeF, blit=False)
-        (txsep, tysep) = pgutils.draw_text(self.screen, sep, self.timeF, blit=False)
-        (tx3, ty3) = pgutils.draw_text(self.screen, minute, self.timeF, blit=False)
+        digits = self.clock_digits()
+        (tx2, ty2) = digits.size(hour)
+        (txsep, tysep) = digits.size(sep)
+        (tx3, ty3) = digits.size(minute)
         if settings.clockMode or self.user_clockMode or self.onlyTime:
             x = (self.xmax - (tx2 + txsep + tx3)) / 2
         self.rectTime = (x, self.rectHeader[3], tx2 + txsep + tx3, ty2 - ty2 * 0.3)
 
-        # Capture area background / Erase previous values
-        if settings.showBkg:
-            self.imgTime = pgutils.prepare_area(self.screen, self.imgTime, self.rectTime)
-        else:
-            pygame.draw.rect(self.screen, settings.cBkg, self.rectTime)
-
         # Separator Xaxis position for further calculations (when drawing just separator)
         self.sepPos = x + tx2
 
-        # Draw time
-        pgutils.draw_text(self.screen, hour, self.timeF, fcolor=settings.clockc, blit=True,
-                          x=x, y=self.clockYPos, outline=settings.outline)
-        pgutils.draw_text(self.screen, sep, self.timeF, fcolor=settings.clockc, blit=True,
-                          x=x + tx3, y=self.clockYPos)
-        pgutils.draw_text(self.screen, minute, self.timeF, fcolor=settings.clockc, blit=True,
-                          x=x + tx3 + txsep, y=self.clockYPos, outline=settings.outline)
-
-        # If time overlaps with alert, re-blit it
-        if self.rectTime[1] + self.rectTime[3] > self.subYPos - self.alertIconScale and self.alert:
-            self.display_alert()
+        # Draw time (pre-rendered glyphs)
+        digits.draw(self.screen, hour, x, self.clockYPos)
+        digits.draw(self.screen, sep, self.sepPos, self.clockYPos)
+        digits.draw(self.screen, minute, self.sepPos + txsep, self.clockYPos)
 
         return self.rectTime
 
+    def clock_digits(self):
+        # Clock digits atlas (built once, unless colors or outline change)
+        return pgutils.digit_atlas(self.timeF, settings.clockc, settings.cdark, settings.outline)
+
     def show_world_clocks(self):
         if settings.debug: print("SHOW_WORLDS", time.strftime("%H:%M:%S"))
 
@@ -614,12 +700,7 @@ class MyWeatherStation:
             self.tzOffset = zoneinfo.get_world_clock_offsets(settings.timeZones)
 
         self.rectFF = (self.xmin, self.subYPos, self.xmax, self.ymax - self.subYPos)
-
-        # Capture area background / Erase previous values
-        if settings.showBkg:
-            self.imgFF = pgutils.prepare_area(self.screen, self.imgFF, self.rectFF)
-        else:
-            pygame.draw.rect(self.screen, settings.cBkg, self.rectFF)
+        self.wRegions = {}
 
         if self.tzOffset:
             zones = len(self.tzOffset)
@@ -649,173 +730,332 @@ class MyWeatherStation:
 
         return self.rectFF
 
+    def weather_url(self):
+        return wconstants.weatherURL % (self.zip_code, settings.disp_units, settings.lang_code)
+
     def update_weather(self, firstRun=False, only_parse=False):
         if settings.debug: print("UPD_WEATHER", time.strftime("%H:%M:%S"))
 
         wUpdated = False
-        update_error = False
-        tb_content = ""
 
         if not only_parse:
-            # Get Weather information from source
-            url = wconstants.weatherURL % (self.zip_code, settings.disp_units, settings.lang_code)
-            try:
-                with urllib.request.urlopen(url, timeout=settings.timeout) as response:
-                    # Decoding is needed only by arm-Linux, and only for JSON responses (not XML)
-                    self.wcc = json.loads(response.read().decode('utf8'))
-            except:
-                update_error = True
-                tb_content = traceback.format_exc()
+            if self.wcc and not self.onlyTime and self.weather_obsolete():
+                # Weather source might be down for long (show clock only)
+                self.onlyTime = True
+                self.onlyTimePrev = False
+                print("Weather info obsolete. Falling back to World Clocks")
+
+            # Get Weather information from source in background, so clock and news ticker don't freeze while waiting
+            # Not while waiting to retry after failures, or if source is known to be down (see wconstants.retryPolicies)
+            # Nor when just switched to a location with recent enough (prefetched) weather info
+            url = self.weather_url()
+            self.wForce = self.wForce or firstRun
+            # Nor if API call budget is exhausted (see wconstants.callBudgets)
+            recent = firstRun and self.wcc and \
+                time.time() - self.wFetchTime < wconstants.min_update_weather * 60 * self.weather_stretch()
+            # Nor if already fetching it, or fetched and not applied yet (at most one fetch per URL)
+            fetcher = self.wFetchers.get(url)
+            if (fetcher is None or not fetcher.is_alive()) and url not in self.wFetched and \
+                    not recent and self.weatherPolicy.can_call() and self.owmBudget.allowed():
+                self.wRequestTime = time.time()
+                self.wFetchers = {u: t for u, t in self.wFetchers.items() if t.is_alive()}
+                self.wFetchers[url] = threading.Thread(target=self.fetch_weather, args=(url,), daemon=True)
+                self.wFetchers[url].start()
+
+        if firstRun or only_parse:
+            # Meanwhile, keep showing last good weather info (if any)
+            if self.wcc and not self.onlyTime:
+                wUpdated = self.parse_openweathermap(self.wcc, force=firstRun)
+            elif not only_parse:
+                # No Weather info yet (show clock only)
+                self.onlyTime = True
+                self.onlyTimePrev = False
 
-        if not update_error:
+        return wUpdated
 
-            wUpdated = self.parse_openweathermap(self.wcc, force=firstRun)
+    def fetch_weather(self, url):
+        # Runs in a separate thread. Result will be picked up by show_all() when ready
+        if settings.debug: print("FETCH_WEATHER", time.strftime("%H:%M:%S"))
 
-            if not only_parse:
+        wcc = None
+        tb_content = ""
+        try:
+            wcc = self.get_weather(url)
+        except:
+            tb_content = traceback.format_exc()
+
+        with self.wFetchLock:
+            self.wFetched[url] = (wcc, time.time(), tb_content)
+
+    def get_weather(self, url, policy=None):
+        # Decoding is needed only by arm-Linux, and only for JSON responses (not XML)
+        def request():
+            # Every request counts (weather requests are never hedged, see wconstants.retryPolicies)
+            self.owmBudget.spend()
+            return json.loads(netutils.get(url, wconstants.HTTP_WEATHER).decode('utf8'))
+
+        return (policy or self.weatherPolicy).call(request)
+
+    def weather_stretch(self):
+        # Factor to stretch update intervals by, depending on how much of the API call budget is left
+        # Calls wanted: current location every min_update_weather, and all the others every min_prefetch_weather
+        demand = 1 / (wconstants.min_update_weather * 60) + \
+            (len(settings.location) - 1) / (wconstants.min_prefetch_weather * 60)
+        return self.owmBudget.stretch(demand)
+
+    def weather_due(self):
+        # Minutes are rounded, so updates keep happening at the same second (sec_update_weather)
+        return round((time.time() - self.wRequestTime) / 60) >= wconstants.min_update_weather * self.weather_stretch()
+
+    def prefetch_weather(self):
+        # Keep weather info of all other locations ready, so switching location doesn't need to wait for it.
+        # Only one location is requested every sec_prefetch_stagger seconds (the one with the oldest info)
+        now = time.time()
+        if now - self.wPrefetchTime < wconstants.sec_prefetch_stagger:
+            return
+
+        oldest = None
+        stretch = self.weather_stretch()
+        for loc in settings.location:
+            zip_code = loc[1]
+            if zip_code != self.zip_code and zip_code not in self.wPrefetching:
+                age = now - self.wCache.get(zip_code, {}).get("time", 0)
+                if age > wconstants.min_prefetch_weather * 60 * stretch and (oldest is None or age > oldest[0]):
+                    oldest = (age, zip_code)
+
+        # Other locations have their own retry policy, so their failures don't stop updates of current one
+        # (and no prefetching while current one is failing: likely the same problem)
+        if oldest is not None and self.weatherPolicy.can_call() and self.prefetchPolicy.can_call() and \
+                self.owmBudget.allowed():
+            if settings.debug: print("PREFETCH_WEATHER", time.strftime("%H:%M:%S"))
+            self.wPrefetchTime = now
+            self.wPrefetching.add(oldest[1])
+            self.wPool.submit(self.prefetch_location, oldest[1])
 
-                if self.onlyTime:
-                    # Recovering from update failure.
-                    # This will force weather info to be drawn despite it changed since last correct update
-                    self.onlyTime = False
-                    self.onlyTimePrev = True
-                    wUpdated = True
+        return
 
+    def prefetch_location(self, zip_code):
+        # Runs in a worker thread
+        url = wconstants.weatherURL % (zip_code, settings.disp_units, settings.lang_code)
+        try:
+            wcc = self.get_weather(url, self.prefetchPolicy)
+            self.cache_weather(zip_code, time.time(), wcc)
+        except netutils.NotReady:
+            pass
+        except:
+            print("Error prefetching Weather for", zip_code)
+            print(traceback.format_exc())
+        self.wPrefetching.discard(zip_code)
+
+    def use_cached_weather(self):
+        # Show (prefetched) weather info for current location, if any. It will be updated as usual afterwards
+        entry = self.wCache.get(self.zip_code)
+        if entry and time.time() - entry["time"] < wconstants.weatherObsolete:
+            self.wcc = entry["data"]
+            self.wFetchTime = entry["time"]
+            if self.onlyTime:
+                self.onlyTime = False
+                self.onlyTimePrev = True
         else:
-            self.errCount += 1
-            if firstRun or self.errCount > wconstants.errMax:
+            self.wcc = ''
+            self.wFetchTime = 0
+
+        return
+
+    def change_location(self, index):
+        if settings.debug: print("CHANGE_LOC", time.strftime("%H:%M:%S"))
+        self.user_clockMode = False
+        self.location = settings.location[index][0]
+        self.zip_code = settings.location[index][1]
+        self.wPrevUpdate = None
+        self.bkgCodePrev = None
+        self.use_cached_weather()
+
+    def apply_weather(self):
+        if settings.debug: print("APPLY_WEATHER", time.strftime("%H:%M:%S"))
+
+        with self.wFetchLock:
+            fetched, self.wFetched = self.wFetched, {}
+        wUpdated = False
+
+        url = self.weather_url()
+        if url not in fetched:
+            # Location or settings changed while fetching. Discard the ones for other URLs
+            return wUpdated
+        wcc, fetchTime, tb_content = fetched[url]
+
+        force = self.wForce
+        self.wForce = False
+
+        if wcc is not None:
+
+            self.wcc = wcc
+            self.wFetchTime = fetchTime
+            self.cache_weather(self.zip_code, fetchTime, wcc)
+
+            wUpdated = self.parse_openweathermap(self.wcc, force=force)
+
+            if self.onlyTime:
+                # Recovering from update failure.
+                # This will force weather info to be drawn despite it changed since last correct update
+                self.onlyTime = False
+                self.onlyTimePrev = True
+                wUpdated = True
+
+        else:
+            if not self.wcc or self.weather_obsolete():
                 # No Weather info or obsolete (show clock only)
                 self.onlyTime = True
                 self.onlyTimePrev = False
                 print("No Weather info or obsolete. Falling back to World Clocks")
             else:
-                print("Error getting Weather update from", settings.wsource, "at", self.last, self.errCount, "times")
+                print("Error getting Weather update from", settings.wsource, "at", self.last_update(),
+                      self.weatherPolicy.failures, "times.", self.weatherPolicy.status())
             print(tb_content)
 
         return wUpdated
 
+    def weather_obsolete(self):
+        return time.time() - self.wFetchTime > wconstants.weatherObsolete
+
+    def load_weather(self):
+        # Weather info of all locations, as {zip_code: {"time": fetch time, "data": One Call response}}
+
+        cache = utils.read_json_file(utils.resource_path(wconstants.WEATHER_CACHE_FILE))
+        try:
+            if cache["units"] == settings.disp_units and cache["lang"] == settings.lang_code:
+                self.wCache = cache["locations"]
+        except:
+            pass
+        self.use_cached_weather()
+
+        return
+
+    def cache_weather(self, zip_code, fetchTime, wcc):
+        # May be called from several threads at the same time. Saved to disk later (see save_weather)
+        with self.wCacheLock:
+            entry = self.wCache.get(zip_code)
+            self.wCache[zip_code] = {"time": fetchTime, "data": wcc}
+            if entry is None or entry["data"] != wcc:
+                self.wSaver.change()
+
+        return
+
+    def save_weather(self, force=False):
+
+        # Only if changed, and not more often than sec_save_weather (unless forced, e.g. when exiting)
+        def cache():
+            with self.wCacheLock:
+                return {"units": settings.disp_units, "lang": settings.lang_code, "locations": dict(self.wCache)}
+
+        self.wSaver.save(cache, force)
+
+        return
+
     def parse_openweathermap(self, w, force=False):
         if settings.debug: print("PARSE_OPENW", time.strftime("%H:%M:%S"))
 
-        # Current Conditions
-        cc = w["current"]
-        ff = w["daily"][0]
-        self.WtzOffset = int(w["timezone_offset"])
-        self.temp = str(int(cc["temp"]))
-        self.feels_like = str(int(cc["feels_like"])) + wconstants.degree_sign
-        self.iconNow = wutils.convert_weather_code(str(cc["weather"][0]["id"]))
+        return self.set_weather(wmodel.WeatherSnapshot.from_onecall(w, settings.disp_units, self.wFetchTime), force)
+
+    def set_weather(self, weather, force=False):
+        # Swap in the new snapshot. Icon and background also depend on current time and settings
+        self.weather = weather
+        self.WtzOffset = weather.tzOffset
+        self.iconNow = weather.code
         self.bkgCode = self.iconNow
-        self.temptext = str(cc["weather"][0]["description"]).capitalize()
-        self.wind_speed = str(cc["wind_speed"] * wconstants.windScale[settings.disp_units])
-        self.wind_dir = wutils.convert_win_direction(cc["wind_deg"], settings.lang)
-        self.baro = str("%.2f" % (cc["pressure"] * wconstants.baroScale[settings.disp_units]))
-        self.humid = str(cc["humidity"])
-        self.uvi = str(int(cc["uvi"]))
-        self.moon = wutils.convert_moon_phase(ff["moon_phase"])
-        self.sunrise = time.strftime("%H:%M", time.gmtime(cc["sunrise"] + self.WtzOffset))
-        self.sunset = time.strftime("%H:%M", time.gmtime(cc["sunset"] + self.WtzOffset))
         hmCurrent = time.strftime("%H:%M")
-        self.nightTime = (self.sunset <= hmCurrent or self.sunrise > hmCurrent)
+        self.nightTime = (weather.local_time(weather.sunset) <= hmCurrent or
+                          weather.local_time(weather.sunrise) > hmCurrent)
         if settings.showBkg and settings.bkgMode == wconstants.BKG_WEATHER:
             if self.nightTime:
-                self.bkgCode = wutils.getNightBkg(cc["weather"][0]["icon"][:-1])
+                self.bkgCode = wutils.getNightBkg(weather.iconCode[:-1])
             elif self.iconNow == "32":
-                if float(self.temp) >= wconstants.tempHigh[settings.disp_units]:
+                if int(weather.temp) >= wconstants.tempHigh[settings.disp_units]:
                     self.iconNow = "36"
                     self.bkgCode = "36"
-                elif float(self.temp) <= wconstants.tempLow[settings.disp_units]:
+                elif int(weather.temp) <= wconstants.tempLow[settings.disp_units]:
                     self.bkgCode = "25"
 
-        self.alert_start = ""
-        self.alert_end = ""
-        self.alert = None
-        wind_speed = float(ff["wind_speed"] * wconstants.windScale[settings.disp_units])
-        uvi = float(ff["uvi"])
-        if "alerts" in w.keys() and w["alerts"][0]["end"] > cc["dt"]:
-            self.alert_start = time.strftime("%H:%M", time.gmtime(w["alerts"][0]["start"] + self.WtzOffset))
-            self.alert_end = time.strftime("%H:%M", time.gmtime(w["alerts"][0]["end"] + self.WtzOffset))
-            self.alert = w["alerts"][0]["event"]
-        elif wind_speed >= wconstants.WindHigh[settings.disp_units]:
-            self.alert = settings.texts["121"] + \
-                         " - " + str(wind_speed) + " " + wconstants.windSpeed[settings.disp_units]
-        elif uvi >= wconstants.UVIHigh:
-            self.alert = settings.texts["120"] + " " + \
-                         settings.texts[str(wconstants.uviUnits[min(int(uvi), 11)])] + \
-                         " - " + str(uvi)
-
         # No apparent way to detect if data has already been updated
         wUpdated = False
-        self.wLastUpdate = self.temp + self.feels_like + self.iconNow + self.temptext + self.wind_speed + self.wind_dir + self.baro + self.humid
-        if self.wPrevUpdate != self.wLastUpdate or force:
-            self.wPrevUpdate = self.wLastUpdate
+        conditions = weather.conditions()
+        if self.wPrevUpdate != conditions or force:
+            self.wPrevUpdate = conditions
             wUpdated = True
-            self.last = hmCurrent
-
-            # Daily Forecasts
-            i = 0
-            j = 0
-            current = int(time.strftime("%y%m%d"))
-            while i < wconstants.NSUB and j < 8:
-                day_data = w["daily"][j]
-                if int(time.strftime("%y%m%d", time.gmtime(day_data["dt"]))) >= current:
-                    self.day[i] = time.strftime("%A, %d", time.gmtime(day_data["dt"] + self.WtzOffset))
-                    self.day[i] = time.strftime("%A", time.gmtime(day_data["dt"] + self.WtzOffset)) \
-                                  + time.strftime(", %d", time.gmtime(day_data["dt"] + self.WtzOffset))
-                    self.icon[i] = wutils.convert_weather_code(str(day_data["weather"][0]["id"]))
-                    self.iconNight[i] = "na"
-                    self.rain[i] = str(int(round(day_data["pop"] * 100 / 5, 0)) * 5)
-                    self.temps[i][0] = str(int(day_data["temp"]["max"])) + wconstants.degree_sign
-                    self.temps[i][1] = str(int(day_data["temp"]["min"])) + wconstants.degree_sign
-                    i += 1
-                j += 1
-
-            # Hourly Forecasts
-            i = 0
-            j = 0
-            while i < wconstants.hourly_number and j < 48:
-                hour_data = w["hourly"][j]
-                dt = hour_data["dt"]
-                if dt > cc["dt"]:
-                    self.hHours[i] = time.strftime("%H:%M", time.gmtime(dt + self.WtzOffset))
-                    self.hTemps[i] = str(int(hour_data["temp"])) + wconstants.degree_sign
-                    icon = wutils.convert_weather_code(str(hour_data["weather"][0]["id"]))
-                    code = str(hour_data["weather"][0]["icon"])
-                    if code[-1:] == "n":
-                        icon = wutils.get_night_icons(icon)
-                    self.hIcons[i] = icon
-                    if dt == 1623186000:  # 23:00
-                        self.iconNight[0] = icon
-                    i += 1
-                j += 1
 
         return wUpdated
 
-    def show_weather(self):
+    def last_update(self):
+        if self.weather is None or not self.weather.fetchTime:
+            return ""
+        return time.strftime("%H:%M", time.localtime(self.weather.fetchTime))
+
+    def weather_alert(self):
+        w = self.weather
+        if w is None:
+            return None
+        units = settings.disp_units
+        if w.alert is not None:
+            return w.local_time(w.alertStart) + " - " + w.local_time(w.alertEnd) + ": " + w.alert
+        elif w.dayWindSpeed >= wconstants.WindHigh[units]:
+            return settings.texts["121"] + " - " + str(float(w.dayWindSpeed)) + " " + wconstants.windSpeed[units]
+        elif w.dayUvi >= wconstants.UVIHigh:
+            return settings.texts["120"] + " " + settings.texts[str(wconstants.uviUnits[min(int(w.dayUvi), 11)])] + \
+                   " - " + str(float(w.dayUvi))
+        return None
+
+    def show_weather(self, full=False):
         if settings.debug: print("SHOW_WEATHER", time.strftime("%H:%M:%S"))
 
-        if settings.dimForecasts:
-            pgutils.dim(self.screen, settings.dimFactor, settings.cdim,
-                        (self.xmin + self.xmargin, self.subYPos, self.xmax - self.xmargin * 2,
-                          self.ymax - self.subYPos - self.ymargin))
+        # Only regions whose data changed since drawn are redrawn (all of them if full, or if not drawn yet)
+        # Other conditions share current conditions area (and its background), so they are redrawn together
+        w = self.weather
+        regions = {"current": (self.iconNow, self.nightTime, w.moon(), int(w.temp), w.description,
+                              self.last_update()),
+                   "other": (int(w.feelsLike), round(w.windSpeed), w.windDeg, "%.2f" % w.pressure, w.humidity,
+                             int(w.uvi)),
+                   "alert": self.weather_alert(),
+                   "hourly": tuple((int(f.temp), f.icon, w.local_time(f.dt)) for f in w.hourly)}
+        for i, f in enumerate(w.daily):
+            regions["daily%i" % i] = (w.local_time(f.dt, "%A, %d"), f.icon, int(f.tempMax), int(f.tempMin), f.pop)
+        if full or not self.wRegions:
+            self.wRegions = {}
+        dirty = [name for name in regions if self.wRegions.get(name, self) != regions[name]]
+        self.wRegions = regions
+
+        self.layers.show("clocks", False)
+        for name in ("current", "alert", "forecasts"):
+            self.layers.show(name)
+
+        # Current Conditions and Other conditions
+        if "current" in dirty or "other" in dirty:
+            self.layers.invalidate("current")
 
-        # Current Conditions
-        ccXPos, ccYPos = self.display_current_conditions()
+        # Alerts
+        if "alert" in dirty:
+            self.layers.invalidate("alert")
 
-        # Other conditions
-        self.display_other_conditions(ccXPos, ccYPos)
+        # Forecasts: only areas covering both previous and new values (panels may overlap, the compositor handles it)
+        if full or len(self.dailyRects) != wconstants.NSUB:
+            self.layers.invalidate("forecasts")
+        else:
+            for i in range(wconstants.NSUB):
+                if "daily%i" % i in dirty:
+                    area = self.layers.measure(self.display_daily_forecasts, i).union(self.dailyRects[i])
+                    self.layers.invalidate("forecasts", area.clip(self.rectFF))
+            if "hourly" in dirty:
+                hourlyYPos = self.subYPos + self.ygap * 7.3
+                self.layers.invalidate("forecasts", (self.xmin, hourlyYPos, self.xmax, self.ymax - hourlyYPos))
 
-        # Alerts
-        self.display_alert()
+        return self.layers.compose()
+
+    def display_forecasts(self):
+        if settings.debug: print("DISP_FORECASTS", time.strftime("%H:%M:%S"))
 
         self.rectFF = self.xmin, self.subYPos, self.xmax, self.ymax - self.subYPos
-        # Capture area background / Erase previous values
-        if settings.showBkg:
-            self.imgFF = pgutils.prepare_area(self.screen, self.imgFF, self.rectFF)
-        else:
-            pygame.draw.rect(self.screen, settings.cBkg, self.rectFF)
 
         # Daily Forecasts
-        for i in range(wconstants.NSUB):
-            self.display_daily_forecasts(i)
+        self.dailyRects = [self.display_daily_forecasts(i) for i in range(wconstants.NSUB)]
 
         # Hourly Forecasts
         for i in range(wconstants.hourly_number):
@@ -830,44 +1070,41 @@ class MyWeatherStation:
         y = self.subYPos - self.alertIconScale - (self.ymargin if settings.dispRatio <= 1.6 else 0)
 
         self.rectAlert = x, y, self.xmax, self.alertIconScale
-        # Capture area background / Erase previous values
-        if settings.showBkg:
-            self.imgAlert = pgutils.prepare_area(self.screen, self.imgAlert, self.rectAlert)
-        else:
-            pygame.draw.rect(self.screen, settings.cBkg, self.rectAlert)
 
-        if self.alert is not None:
+        alert = self.weather_alert()
+        if alert is not None:
 
-            if self.alertIcon is None:
-                self.alertIcon = pgutils.load_icon(wconstants.ALERT_ICON, wconstants.ALERT_ICONFOLDER)
-                self.alertIcon = pygame.transform.smoothscale(self.alertIcon,
-                                                              (self.alertIconScale, self.alertIconScale))
-            (ix, iy) = self.alertIcon.get_size()
+            alertIcon = pgutils.get_icon(wconstants.ALERT_ICON, wconstants.ALERT_ICONFOLDER,
+                                         wlayout.alert_icon_size(self.alertIconScale))
+            (ix, iy) = alertIcon.get_size()
 
-            self.screen.blit(self.alertIcon, (x, y))
+            self.screen.blit(alertIcon, (x, y))
 
-            prefix = ""
-            if self.alert_start:
-                prefix = self.alert_start + " - " + self.alert_end + ": "
-            pgutils.draw_text(self.screen, prefix + self.alert, self.alertF, settings.chigh, True,
+            pgutils.draw_text(self.screen, alert, self.alertF, settings.chigh, True,
                               x + ix + self.xmargin, y + self.ymargin)
 
-        return
+        return self.rectAlert
+
+    def display_conditions(self):
+        # Current and other conditions (same layer)
+        ccXPos, ccYPos = self.display_current_conditions()
+        rect = self.display_other_conditions(ccXPos, ccYPos)
+
+        return rect.union(self.rectCC)
 
     def display_current_conditions(self):
         if settings.debug: print("DISP_CURR", time.strftime("%H:%M:%S"))
 
         x = self.CCXPos
         y = self.CCYPos
+        w = self.weather
+        temp = str(int(w.temp))
+        last = settings.texts["106"] + " " + self.last_update()
+        moon = w.moon()
         iconGap = 0
-        tempGap = self.xmargin * (3 - len(self.temp))
+        tempGap = self.xmargin * (3 - len(temp))
 
-        # Capture area background / Erase previous values
-        self.rectCC = (self.rectTime[0] + self.rectTime[2], y, self.xmax - x, self.rectTime[3])
-        if settings.showBkg:
-            self.imgCC = pgutils.prepare_area(self.screen, self.imgCC, self.rectCC)
-        else:
-            pygame.draw.rect(self.screen, settings.cBkg, self.rectCC)
+        self.rectCC = pygame.Rect(self.rectTime[0] + self.rectTime[2], y, self.xmax - x, self.rectTime[3])
 
         # PREPARE Current conditions Icon
         icon = self.iconNow
@@ -877,8 +1114,8 @@ class MyWeatherStation:
         drawMoonPhase = settings.moonMode in (wconstants.MOON_ONCURRENT, wconstants.MOON_BOTH)
         if self.nightTime:
             icon = wutils.get_night_icons(self.iconNow)
-            if drawMoonPhase and self.moon and icon != self.iconNow:
-                icon = self.moon
+            if drawMoonPhase and moon and icon != self.iconNow:
+                icon = moon
                 folder = wconstants.MOON_FOLDER
                 scale = self.moonIconScale
                 drawMoonPhase = False
@@ -887,89 +1124,72 @@ class MyWeatherStation:
                 self.iconC2 = wutils.getMoonWIcons(self.iconNow)
                 if self.iconC2 is not None:
                     drawMoonWIcon = True
-                    if self.iconC2 != self.iconC2Prev or self.iconImgC2 is None:
-                        self.iconC2Prev = self.iconC2
-                        self.iconImgC2 = pgutils.load_icon(self.iconC2, folder=wconstants.MOON_W_FOLDER)
-                        (i2x, i2y) = self.iconImgC2.get_size()
-                        self.iconImgC2 = pygame.transform.smoothscale(self.iconImgC2, (int(self.iconScaleC*0.7), int((i2y*(self.iconScaleC/i2x))*0.7)))
-                    (i2x, i2y) = self.iconImgC2.get_size()
+                    size = pgutils.icon_size(self.iconC2, wconstants.MOON_W_FOLDER)
+                    iconImgC2 = pgutils.get_icon(self.iconC2, wconstants.MOON_W_FOLDER,
+                                                 wlayout.moon_w_icon_size(size, self.iconScaleC))
+                    (i2x, i2y) = iconImgC2.get_size()
                     tempGap += i2x / 7
 
-        if icon != self.iconNowPrev:
-            self.iconNowPrev = icon
-            self.iconImgC = pgutils.load_icon(icon, folder)
-            (ix, iy) = self.iconImgC.get_size()
-
-            if ix != scale:
-                if ix != iy:
-                    # These icons are wider than taller and need a different scale and additional space
-                    scaleX = int(scale)
-                    scaleY = int(iy * (scale / ix))
-                else:
-                    scaleX = int(scale)
-                    scaleY = int(scale)
-                self.iconImgC = pygame.transform.smoothscale(self.iconImgC, (scaleX, scaleY))
-        (ix, iy) = self.iconImgC.get_size()
+        iconImgC = pgutils.get_icon(icon, folder, wlayout.current_icon_size(pgutils.icon_size(icon, folder), scale))
+        (ix, iy) = iconImgC.get_size()
         if ix != iy:
             iconGap = -self.xgap * 0.8
             tempGap = 0
 
         # PREPARE Outside Temp
-        (tx, ty) = pgutils.draw_text(self.screen, self.temp, self.tempF, blit=False)
+        (tx, ty) = pgutils.draw_text(self.screen, temp, self.tempF, blit=False)
         (dtx, dty) = pgutils.draw_text(self.screen, wconstants.degree_sign, self.degF, blit=False)
-        (ttx, tty) = pgutils.draw_text(self.screen, self.temptext, self.temptxF, blit=False)
-        (utx, uty) = pgutils.draw_text(self.screen, settings.texts["106"] + " " + self.last,
-                                       self.condF, blit=False)
+        (ttx, tty) = pgutils.draw_text(self.screen, w.description, self.temptxF, blit=False)
+        (utx, uty) = pgutils.draw_text(self.screen, last, self.condF, blit=False)
 
         # BLIT Current conditions Icon
         iconX = x + iconGap + ((self.xmax - x) - ix - tempGap - tx - dtx) / 2
-        self.screen.blit(self.iconImgC, (iconX, y))
+        self.screen.blit(iconImgC, (iconX, y))
         if drawMoonWIcon:
-            self.screen.blit(self.iconImgC2, (iconX + self.xgap, y + iy - i2y))
+            self.screen.blit(iconImgC2, (iconX + self.xgap, y + iy - i2y))
         elif drawMoonPhase and not self.onlyTime and not settings.clockMode and not self.user_clockMode:
-                scale = int(self.sunsignIconScale * 0.5)
-                if not self.moonHIcon or self.moon != self.prevMoon:
-                    self.prevMoon = self.moon
-                    self.moonHIcon = pgutils.load_icon(self.moon, wconstants.MOON_FOLDER)
-                    self.moonHIcon = pygame.transform.smoothscale(self.moonHIcon, (scale, scale))
-                self.screen.blit(self.moonHIcon, (self.xMoon, self.ygap))
+                moonIcon = pgutils.get_icon(moon, wconstants.MOON_FOLDER, wlayout.header_moon_size(self.sunsignIconScale))
+                self.screen.blit(moonIcon, (self.xMoon, self.ygap))
+                # Moon is drawn on header, but it belongs to current conditions
+                self.rectCC.union_ip((self.xMoon, self.ygap) + moonIcon.get_size())
 
         # DRAW Outside Temp
         y = y - self.ygap
-        pgutils.draw_text(self.screen, self.temp, self.tempF, fcolor=settings.wc, blit=True,
+        pgutils.draw_text(self.screen, temp, self.tempF, fcolor=settings.wc, blit=True,
                           x=iconX + ix + tempGap, y=y, outline=settings.outline)
         y = y + self.ymargin * 2
         pgutils.draw_text(self.screen, wconstants.degree_sign, self.degF, fcolor=settings.wc, blit=True,
                           x=iconX + ix + tempGap + tx, y=y + self.ygap, outline=settings.outline)
         y = y + ty - self.ygap * 2
-        pgutils.draw_text(self.screen, self.temptext, self.temptxF, fcolor=settings.wc, blit=True,
+        pgutils.draw_text(self.screen, w.description, self.temptxF, fcolor=settings.wc, blit=True,
                           x=x + ((self.xmax - x) - ttx) / 2, y=y, outline=settings.outline)
         y = y + tty * 1.25
-        pgutils.draw_text(self.screen, settings.texts["106"] + " " + self.last, self.condF,
-                          fcolor=settings.wc, blit=True, x=x + ((self.xmax - x) - utx) / 2, y=y)
+        pgutils.draw_text(self.screen, last, self.condF, fcolor=settings.wc, blit=True, x=x + ((self.xmax - x) - utx) / 2, y=y)
 
         return self.CCXPos, y + uty * 1.7
 
     def display_other_conditions(self, XPos, YPos):
         if settings.debug: print("DISP_OTHER", time.strftime("%H:%M:%S"))
 
-        windchill = settings.texts["101"] + " " + self.feels_like
-        windspeed = settings.texts["102"] + " " + ("%.0f %s" % (float(self.wind_speed), wconstants.windSpeed[settings.disp_units]))
-        winddir = settings.texts["103"] + " " + self.wind_dir
+        w = self.weather
+        windchill = settings.texts["101"] + " " + str(int(w.feelsLike)) + wconstants.degree_sign
+        windspeed = settings.texts["102"] + " " + ("%.0f %s" % (w.windSpeed, wconstants.windSpeed[settings.disp_units]))
+        winddir = settings.texts["103"] + " " + wutils.convert_win_direction(w.windDeg, settings.lang)
         line = windchill + "   " + windspeed + "   " + winddir
-        (tx1, ty1) = pgutils.draw_text(self.screen, line, self.condF, blit=False)
-        x = XPos + ((self.xmax - XPos - tx1) / 2)
-        pgutils.draw_text(self.screen, line, self.condF, fcolor=settings.wc, blit=True, x=x, y=YPos)
+        (tx1, ty1) = pgutils.draw_text_at(self.screen, line, self.condF, settings.wc, (XPos + self.xmax) / 2, YPos,
+                                          halign=0.5)
+        rect = pygame.Rect((XPos + self.xmax) / 2 - tx1 / 2, YPos, tx1, ty1)
 
-        barometer = settings.texts["104"] + " " + self.baro + wconstants.baroUnits[settings.disp_units]
-        humidity = settings.texts["105"] + " " + self.humid + "%"
-        uvi = "UVI " + settings.texts[str(wconstants.uviUnits[min(int(self.uvi), 11)])]
+        barometer = settings.texts["104"] + " " + ("%.2f" % w.pressure) + wconstants.baroUnits[settings.disp_units]
+        humidity = settings.texts["105"] + " " + str(w.humidity) + "%"
+        uvi = "UVI " + settings.texts[str(wconstants.uviUnits[min(int(w.uvi), 11)])]
         line = barometer + "   " + humidity + "   " + uvi
-        (tx2, ty2) = pgutils.draw_text(self.screen, line, self.condF, blit=False)
-        x = XPos + ((self.xmax - XPos - tx2) / 2)
-        pgutils.draw_text(self.screen, line, self.condF, fcolor=settings.wc, blit=True, x=x, y=YPos + ty1 * 1.25)
+        (tx2, ty2) = pgutils.draw_text_at(self.screen, line, self.condF, settings.wc, (XPos + self.xmax) / 2,
+                                          YPos + ty1 * 1.25, halign=0.5)
+        rect.union_ip(((XPos + self.xmax) / 2 - tx2 / 2, YPos + ty1 * 1.25, tx2, ty2))
 
-        return
+        # Area actually drawn (wider than current conditions area, depending on texts)
+        return rect
 
     def display_daily_forecasts(self, subwin):
         if settings.debug: print("DISP_DAILY", time.strftime("%H:%M:%S"))
@@ -977,81 +1197,81 @@ class MyWeatherStation:
         subwinWidth = (self.xmax - self.xgap * 2) / wconstants.NSUB
         x = (subwinWidth * subwin) + self.xgap*2
         y = self.subYPos
+        if subwin >= len(self.weather.daily):
+            return pygame.Rect(x, y, 0, 0)
+        forecast = self.weather.daily[subwin]
+        day = self.weather.local_time(forecast.dt, "%A, %d")
+        tempMax = str(int(forecast.tempMax)) + wconstants.degree_sign
+        tempMin = str(int(forecast.tempMin)) + wconstants.degree_sign
+        rain = str(forecast.pop)
 
         # Draw day
-        tx, ty = pgutils.draw_text(self.screen, self.day[subwin], self.subtempMinF, fcolor=settings.wc, blit=True,
+        tx, ty = pgutils.draw_text(self.screen, day, self.subtempMinF, fcolor=settings.wc, blit=True,
                                    x=x+self.xmargin, y=y)
+        area = pygame.Rect(x + self.xmargin, y, tx, ty)
         y = y + ty
 
         # Draw icon
-        if self.icon[subwin] != self.iconPrev[subwin]:
-            self.iconPrev[subwin] = self.icon[subwin]
-            self.iconImg[subwin] = pgutils.load_icon(self.icon[subwin], self.iconf)
-
-        (ix, iy) = self.iconImg[subwin].get_size()
-        if ix != self.iconScaleF:
-            if ix != iy:
-                # These icons are wider than longer and need a different scale
-                scaleX = int(self.iconScaleF * 1.15)
-                scaleY = int(iy * ((self.iconScaleF * 1.15) / ix))
-            else:
-                scaleX = self.iconScaleF
-                scaleY = int(iy * (self.iconScaleF / ix))
-            self.iconImg[subwin] = pygame.transform.smoothscale(self.iconImg[subwin], (scaleX, scaleY))
-            (ix, iy) = self.iconImg[subwin].get_size()
+        icon = pgutils.get_icon(forecast.icon, self.iconf,
+                                wlayout.daily_icon_size(pgutils.icon_size(forecast.icon, self.iconf), self.iconScaleF))
+        (ix, iy) = icon.get_size()
         if ix != iy:
             x = x - self.xgap*1.5
 
-        self.screen.blit(self.iconImg[subwin], (x, y))
+        self.screen.blit(icon, (x, y))
 
-        (tx1, ty1) = pgutils.draw_text(self.screen, self.temps[subwin][0] + " ", self.subtempMaxF, blit=False)
-        (tx2, ty2) = pgutils.draw_text(self.screen, self.temps[subwin][1], self.subtempMinF, blit=False)
-        pgutils.draw_text(self.screen, self.temps[subwin][0], self.subtempMaxF, settings.wc, blit=True, x=x + ix, y=y)
+        (tx1, ty1) = pgutils.draw_text(self.screen, tempMax + " ", self.subtempMaxF, blit=False)
+        (tx2, ty2) = pgutils.draw_text(self.screen, tempMin, self.subtempMinF, blit=False)
+        area.union_ip((x, y, ix + tx1 + tx2, max(iy, ty1)))
+        pgutils.draw_text(self.screen, tempMax, self.subtempMaxF, settings.wc, blit=True, x=x + ix, y=y)
         y = y + ty1 * 0.3
-        pgutils.draw_text(self.screen, self.temps[subwin][1], self.subtempMinF, settings.wc, blit=True, x=x + ix + tx1, y=y)
+        pgutils.draw_text(self.screen, tempMin, self.subtempMinF, settings.wc, blit=True, x=x + ix + tx1, y=y)
 
         # Draw rain chance
         self.crc = settings.clockc
-        (rtx, rty) = pgutils.draw_text(self.screen, self.rain[subwin], self.subrainF, self.crc, False)
+        (rtx, rty) = pgutils.draw_text(self.screen, rain, self.subrainF, self.crc, False)
         (ptx, pty) = pgutils.draw_text(self.screen, "%", self.percF, self.crc, False)
-        if int(self.rain[subwin]) >= wconstants.RainHigh:
+        if forecast.pop >= wconstants.RainHigh:
             self.crc = settings.crcw
-        elif int(self.rain[subwin]) >= 20:
+        elif forecast.pop >= 20:
             self.crc = settings.crcm
         x = x + ix
         y = y + ty2 * 0.7
-        pgutils.draw_text(self.screen, self.rain[subwin], self.subrainF, self.crc, True, x, y)
+        pgutils.draw_text(self.screen, rain, self.subrainF, self.crc, True, x, y)
+        area.union_ip((x, y, rtx, rty))
         x = x + rtx
         y = y + rty / 2.3
         pgutils.draw_text(self.screen, "%", self.percF, self.crc, True, x, y)
+        area.union_ip((x, y, ptx, pty))
 
-        return self.xmin, self.subYPos, self.xmax, y + pty
+        # Area actually drawn (it may overlap next panel or hourly forecasts)
+        return area
 
     def display_hourly_forecasts(self, subwin):
         if settings.debug: print("DISP_HOURLY", time.strftime("%H:%M:%S"))
 
-        subwinWidth = (self.xmax - self.xgap) / wconstants.hourly_number
+        subwinWidth = wlayout.hourly_width(self.xmax)
         subwinCenter = self.xgap / 2 + subwinWidth * (subwin + 1) - subwinWidth / 2
         YPos = self.subYPos + self.ygap * 7.3
         y = YPos
+        if subwin >= len(self.weather.hourly):
+            return
+        forecast = self.weather.hourly[subwin]
+        temp = str(int(forecast.temp)) + wconstants.degree_sign
+        hour = self.weather.local_time(forecast.dt)
 
         # Draw temp
-        (tx, ty) = pgutils.draw_text(self.screen, self.hTemps[subwin] + " ", self.subHourlyTempF, blit=False)
-        pgutils.draw_text(self.screen, self.hTemps[subwin], self.subHourlyTempF, fcolor=settings.wc, blit=True,
+        (tx, ty) = pgutils.draw_text(self.screen, temp + " ", self.subHourlyTempF, blit=False)
+        pgutils.draw_text(self.screen, temp, self.subHourlyTempF, fcolor=settings.wc, blit=True,
                           x=subwinCenter - tx / 2.5, y=y)
 
         # Draw icon
         y = y + ty
-        if self.hIcons[subwin] != self.hIconPrev or subwin == 0:
-            self.hIconPrev = self.hIcons[subwin]
-            icon = pgutils.load_icon(self.hIcons[subwin], self.iconf)
-            ix, iy = icon.get_size()
-            subScale = 1.1
-            if ix != iy:
-                subScale = 1.0
-            scaleX = int(subwinWidth * subScale * wconstants.ICON_SCALE.get(settings.iconSet, 1.0))
-            scaleY = int(scaleX * (iy / ix))
-            icon = pygame.transform.smoothscale(icon, (scaleX, scaleY))
+        if forecast.icon != self.hIconPrev or subwin == 0:
+            self.hIconPrev = forecast.icon
+            ix, iy = pgutils.icon_size(forecast.icon, self.iconf)
+            scaleX, scaleY = wlayout.hourly_icon_size((ix, iy), subwinWidth, settings.iconSet)
+            icon = pgutils.get_icon(forecast.icon, self.iconf, (scaleX, scaleY))
             xGap = 1.9
             if ix != iy:
                 xGap = 1.7
@@ -1061,11 +1281,9 @@ class MyWeatherStation:
         y = y + ty + self.ygap * 1.5
         if subwin % 2 == 0:
             color = settings.wc
-            if int(self.hHours[subwin][:2]) == 0:
+            if int(hour[:2]) == 0:
                 color = settings.clockc
-            (rtx, rty) = pgutils.draw_text(self.screen, self.hHours[subwin], self.subHourlyHourF, blit=False)
-            pgutils.draw_text(self.screen, self.hHours[subwin], self.subHourlyHourF, fcolor=color, blit=True,
-                              x=subwinCenter - rtx / 2, y=y)
+            pgutils.draw_text_at(self.screen, hour, self.subHourlyHourF, color, subwinCenter, y, halign=0.5)
 
         return
 
@@ -1075,30 +1293,34 @@ class MyWeatherStation:
         nUpdated = False
         update_error = False
 
-        # Get news from RSS source and parse them into string variable
+        # Get news from RSS source and parse them into string variable while reading (stops when enough are gathered)
         try:
-            # requests module returns obsolete info (caching?) for rtve API
-            with urllib.request.urlopen(self.nURL, timeout=settings.timeout) as response:
-                n = response.read()
+            # requests module returns obsolete info (caching?) for rtve API. Cache-busting is applied to HTTP_NEWS
+            policy = netutils.policy(wconstants.HTTP_NEWS, self.nsource)
+            response = policy.call(netutils.urlopen, self.nURL, wconstants.HTTP_NEWS)
+        except netutils.NotReady as e:
+            update_error = True
+            print("Not getting News now from", e)
         except:
             update_error = True
             print("Error getting News from", self.nsource)
             print(traceback.format_exc())
 
         if not update_error:
-            h = time.strftime('%H')
-            m = time.strftime('%M')
-            if m == "59":
-                h = str("%02i" % ((int(h) + 1) % 24))
-            m = str("%02i" % ((int(m) + 1) % 60))
-            self.titles = self.nsource + " " + h + ":" + m + " " + settings.separator
-
-            if self.nsource == wconstants.NEWS_1:
-                nUpdated = self.parse_rtve(n)
-            elif self.nsource == wconstants.NEWS_2:
-                nUpdated = self.parse_bbc(n)
-            else:
-                print("ERROR: Unknown News source. Unable to access/parse it. Check settings!")
+            with response:
+                h = time.strftime('%H')
+                m = time.strftime('%M')
+                if m == "59":
+                    h = str("%02i" % ((int(h) + 1) % 24))
+                m = str("%02i" % ((int(m) + 1) % 60))
+                self.titles = self.nsource + " " + h + ":" + m + " " + settings.separator
+
+                if self.nsource == wconstants.NEWS_1:
+                    nUpdated = self.parse_rtve(response)
+                elif self.nsource == wconstants.NEWS_2:
+                    nUpdated = self.parse_bbc(response)
+                else:
+                    print("ERROR: Unknown News source. Unable to access/parse it. Check settings!")
 
         if settings.alternSource:
             if self.nsource == wconstants.nsource2:
@@ -1113,46 +1335,60 @@ class MyWeatherStation:
     def parse_rtve(self, n):
         if settings.debug: print("PARSE_RTVE", time.strftime("%H:%M:%S"))
 
-        n = ET.fromstring(n)
-
         nUpdated = False
         try:
             i = 0
-            for item in n.findall('./page/items/com.irtve.plataforma.rest.model.dto.news.NewsDTO'):
-                if i < wconstants.newsNumber:
-                    self.titles += item.find('longTitle').text + settings.separator
-                    if settings.showPics:
-                        try:
-                            self.pics[i] = pgutils.load_url_image(item.find('imageSEO').text, timeout=settings.timeout)
-                        except:
-                            self.pics[i] = None
-                            print("Error getting pic", i + 1)
-                            print(traceback.format_exc())
-                    i += 1
-                else:
+            urls = []
+            for item in utils.iter_xml_items(n, 'page/items/com.irtve.plataforma.rest.model.dto.news.NewsDTO'):
+                self.titles += item.find('longTitle').text + settings.separator
+                if settings.showPics:
+                    pic = item.find('imageSEO')
+                    urls.append(pic.text if pic is not None else None)
+                i += 1
+                if i >= wconstants.newsNumber:
                     break
             nUpdated = True
 
+            if settings.showPics:
+                self.load_news_pics(urls)
+
         except:
             print("Error parsing News from:", self.nsource)
             print(traceback.format_exc())
 
         return nUpdated
 
+    def load_news_pics(self, urls):
+        if settings.debug: print("LOAD_PICS", time.strftime("%H:%M:%S"))
+
+        # Download, decode and scale all pics in parallel. They are stored in self.pics as soon as they are ready
+        self.picsCycle += 1
+        self.pics = [None] * wconstants.newsNumber
+        width = int(self.xmax / wconstants.newsNumber)
+        for i, url in enumerate(urls):
+            if url:
+                future = self.picsPool.submit(pgutils.load_url_image, url, width=width,
+                                              timeout=wconstants.httpTimeouts[wconstants.HTTP_PICS])
+                future.add_done_callback(functools.partial(self.news_pic_ready, self.picsCycle, i))
+
+        return
+
+    def news_pic_ready(self, cycle, i, future):
+        # Runs in a worker thread. Discard pics from a previous News update
+        if cycle == self.picsCycle:
+            self.pics[i] = future.result()
+
     def parse_bbc(self, n):
         if settings.debug: print("PARSE_BBC", time.strftime("%H:%M:%S"))
 
-        n = ET.fromstring(n)
-
         nUpdated = False
 
         try:
             i = 0
-            for item in n.findall('./channel/item'):
-                if i < wconstants.newsNumber:
-                    self.titles += item.find('title').text + settings.separator
-                    i += 1
-                else:
+            for item in utils.iter_xml_items(n, 'channel/item'):
+                self.titles += item.find('title').text + settings.separator
+                i += 1
+                if i >= wconstants.newsNumber:
                     break
             nUpdated = True
 
@@ -1242,17 +1478,20 @@ class MyWeatherStation:
         # Draw News pics
         for i in range(len(self.pics)):
             try:
-                if self.pics[i] is not None:
-                    (ix, iy) = self.pics[i].get_size()
-                    if (ix, iy) != (width, int(iy * (width / ix))):
-                        pic = pygame.transform.smoothscale(self.pics[i], (width, int(iy * (width / ix))))
+                pic = self.pics[i]
+                if pic is not None:
+                    # Pics are already scaled while downloading. Just in case, as a fallback
+                    (ix, iy) = pic.get_size()
+                    if ix != width:
+                        pic = pygame.transform.smoothscale(pic, (width, int(iy * (width / ix))))
                     self.screen.blit(pic, (width * i, (y + h)))
             except:
                 print("ERROR drawing News Image", i)
                 print(traceback.format_exc())
 
         # Free memory used by pics
-        self.pics = ["", "", "", "", ""]
+        self.picsCycle += 1
+        self.pics = [None] * wconstants.newsNumber
 
         # Update display to draw pics
         pygame.display.update(rectPics)
@@ -1359,6 +1598,9 @@ class MyWeatherStation:
 
     def sys_info(self):
         sys_info = "CPU Usage / Temp: " + utils.get_CPU_usage(self.archOS) + " - " + utils.get_CPU_temp(self.archOS)
+        for status in (netutils.policies_status(), netutils.budgets_status()):
+            if status:
+                sys_info += " | " + status
         widget = self.menu.get_widget("sys_info")
         if widget is not None:
             widget.set_title(sys_info)
@@ -1376,11 +1618,7 @@ class MyWeatherStation:
 
     def set_location(self, selected: Tuple, value: Any):
         if settings.debug: print("SET_LOC", time.strftime("%H:%M:%S"))
-        self.user_clockMode = False
-        self.location = settings.location[int(value) - 1][0]
-        self.zip_code = settings.location[int(value) - 1][1]
-        self.wLastUpdate = ""
-        self.bkgCodePrev = None
+        self.change_location(int(value) - 1)
         self.updateWeather = True
 
     def set_news(self, selected: Tuple, value: Any):
@@ -1401,7 +1639,7 @@ class MyWeatherStation:
 
     def set_weather_mode(self):
         self.user_clockMode = False
-        self.wLastUpdate = ""
+        self.wPrevUpdate = None
         self.updateWeather = True
         self.menu_back()
 
@@ -1434,7 +1672,10 @@ class MyWeatherStation:
                 y += self.titlebar_height
             else:
                 y -= self.titlebar_height
+        self.save_weather(force=True)
         importlib.reload(settings)
+        self.picsPool.shutdown(wait=False)
+        self.wPool.shutdown(wait=False)
         pygame.display.quit()
         self.__init__(pos=(x, y))
 
@@ -1474,7 +1715,7 @@ class MyWeatherStation:
         if self.menu:
             self.menu.enable()
         else:
-            self.wLastUpdate = ""
+            self.wPrevUpdate = None
             self.bkgCodePrev = None
             self.show_all(displayAll=True, updateWeather=True)
 
@@ -1487,6 +1728,7 @@ class MyWeatherStation:
 
             if event.type == pygame.QUIT:
                 # On windowed mode, exit when clicking the "x" (close window)
+                self.save_weather(force=True)
                 pygame.display.quit()
                 pygame.quit()
                 sys.exit()
@@ -1501,6 +1743,7 @@ class MyWeatherStation:
 
                 if event.key in (pygame.K_q, pygame.K_ESCAPE):
                     # On 'q' or Escape pressed, quit the program.
+                    self.save_weather(force=True)
                     pygame.display.quit()
                     pygame.quit()
                     sys.exit()
@@ -1510,11 +1753,7 @@ class MyWeatherStation:
 
                     if "1" <= pygame.key.name(event.key) <= str(len(settings.location)) and not settings.clockMode:
                         # Change Weather Location (assigned to numbers) and show Weather
-                        self.user_clockMode = False
-                        self.location = settings.location[int(pygame.key.name(event.key)) - 1][0]
-                        self.zip_code = settings.location[int(pygame.key.name(event.key)) - 1][1]
-                        self.wLastUpdate = ""
-                        self.bkgCodePrev = None
+                        self.change_location(int(pygame.key.name(event.key)) - 1)
                         self.show_all(displayAll=True, updateWeather=True)
                         displayChanged = True
 
@@ -1528,7 +1767,7 @@ class MyWeatherStation:
                     elif event.key == pygame.K_w and self.user_clockMode and not settings.clockMode:
                         # Back to Weather mode
                         self.user_clockMode = False
-                        self.wLastUpdate = ""
+                        self.wPrevUpdate = None
                         self.show_all(displayAll=True, updateWeather=True)
                         displayChanged = True
 